@@ -0,0 +1,405 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+import pygame
+
+from benchmarks.synthetic import init_headless, BenchGame, make_map
+from scripts.tilemap import Tilemap
+from scripts.entities import Enemy
+from scripts.enemy_ai import EnemyAI
+from scripts.outline import Outliner
+from scripts.transition import Transition
+from scripts.clouds import Clouds
+from scripts.rng import GameRandom
+from scripts.utils import ANIM_CLOCK
+
+# Benchmarks for the hot paths of the game, run headless on the made up assets and maps of synthetic.py
+# Every benchmark reports how many operations or frames it does per second, so bigger is always better
+# The results are compared against a baseline file and anything that got slower than the tolerance allows fails the run
+# Run from the project root: python -m benchmarks.run
+# The numbers only mean something on the machine they were measured on, so every machine saves its own baseline with --update-baseline before making changes
+# (the file is not kept in git) and the run only fails against a baseline saved on the same kind of machine, other baselines are just shown for comparison
+# CI should run with --strict, that fails the run when there is no baseline of the same kind of machine instead of quietly not comparing
+
+BASELINE_PATH = 'benchmarks/baseline.json'
+DISPLAY_SIZE = (320, 240)
+MAP_SIZES = [(64, 32), (256, 64), (1024, 128)]     # Width and height in tiles
+ENEMY_COUNTS = [10, 100, 500]
+
+BENCHMARKS = []     # (name, unit, setup), setup returns the function to time and how many operations one call of it does
+
+def benchmark(name, unit='ops/s'):
+    def register(setup):
+        BENCHMARKS.append((name, unit, setup))
+        return setup
+    return register
+
+# --- SHARED SETUP ---
+
+GAME = None
+MAPS = {}
+
+def game():
+    global GAME
+    if GAME is None:
+        GAME = BenchGame()
+    return GAME
+
+# Maps are generated once per size and shared by the benchmarks, none of them changes the map
+def bench_map(size):
+    if size not in MAPS:
+        MAPS[size] = make_map(Tilemap(game(), tile_size=16), size[0], size[1])
+    return MAPS[size]
+
+# Positions spread over the whole map, from a fixed seed
+def map_positions(tilemap, size, count=1024):
+    rng = random.Random(1)
+    return [(rng.random() * size[0] * tilemap.tile_size, rng.random() * size[1] * tilemap.tile_size) for i in range(count)]
+
+# Camera offsets for panning across the map
+def camera_path(tilemap, size, count=256):
+    width = size[0] * tilemap.tile_size - DISPLAY_SIZE[0]
+    height = size[1] * tilemap.tile_size - DISPLAY_SIZE[1]
+    return [(int(i / count * width), int((0.5 + 0.5 * ((i * 7) % count) / count) * height)) for i in range(count)]
+
+def size_name(size):
+    return str(size[0]) + 'x' + str(size[1])
+
+# --- TILEMAP ---
+
+def bench_tilemap_render(size):
+    tilemap = bench_map(size)
+    surf = pygame.Surface(DISPLAY_SIZE, pygame.SRCALPHA)
+    offsets = camera_path(tilemap, size)
+    state = [0]
+    def run():
+        state[0] = (state[0] + 1) % len(offsets)
+        tilemap.render(surf, offset=offsets[state[0]])
+    return run, 1
+
+def bench_tiles_around(size):
+    tilemap = bench_map(size)
+    positions = map_positions(tilemap, size)
+    def run():
+        for pos in positions:
+            tilemap.tiles_around(pos)
+    return run, len(positions)
+
+def bench_physics_rects_around(size):
+    tilemap = bench_map(size)
+    positions = map_positions(tilemap, size)
+    def run():
+        for pos in positions:
+            tilemap.physics_rects_around(pos)
+    return run, len(positions)
+
+def bench_solid_check(size):
+    tilemap = bench_map(size)
+    positions = map_positions(tilemap, size)
+    def run():
+        for pos in positions:
+            tilemap.solid_check(pos)
+    return run, len(positions)
+
+# Tiles autotiled per second in a full pass
+def bench_autotile(size):
+    tilemap = bench_map(size)
+    tiles = sum(1 for cell in tilemap.cells())
+    return tilemap.autotile, tiles
+
+# Single edits the way the editor autotiles them
+def bench_autotile_around(size):
+    tilemap = bench_map(size)
+    cells = [(x, y) for x, y, value in tilemap.cells()][:1024]
+    def run():
+        for pos in cells:
+            tilemap.autotile_around(pos)
+    return run, len(cells)
+
+def bench_tilemap_load(size, ext):
+    tilemap = bench_map(size)
+    path = os.path.join(tempfile.mkdtemp(), 'map' + ext)
+    tilemap.save(path)
+    loaded = Tilemap(game(), tile_size=16)
+    return lambda: loaded.load(path), 1
+
+for size in MAP_SIZES:
+    benchmark('tilemap.render ' + size_name(size), 'fps')(lambda size=size: bench_tilemap_render(size))
+    benchmark('tilemap.tiles_around ' + size_name(size))(lambda size=size: bench_tiles_around(size))
+    benchmark('tilemap.physics_rects_around ' + size_name(size))(lambda size=size: bench_physics_rects_around(size))
+    benchmark('tilemap.solid_check ' + size_name(size))(lambda size=size: bench_solid_check(size))
+    benchmark('tilemap.autotile ' + size_name(size), 'tiles/s')(lambda size=size: bench_autotile(size))
+    benchmark('tilemap.autotile_around ' + size_name(size))(lambda size=size: bench_autotile_around(size))
+    benchmark('tilemap.load json ' + size_name(size), 'loads/s')(lambda size=size: bench_tilemap_load(size, '.json'))
+    benchmark('tilemap.load binary ' + size_name(size), 'loads/s')(lambda size=size: bench_tilemap_load(size, '.map'))
+
+# --- ENTITIES ---
+
+# All the enemies standing on the ground of the middle sized map, one call is one simulation step of all of them
+def bench_enemies(count):
+    size = MAP_SIZES[1]
+    tilemap = bench_map(size)
+    g = game()
+    g.rng = GameRandom(0)     # Same walking decisions on every run
+    rng = random.Random(2)
+    enemies = EnemyAI(g)
+    for i in range(count):
+        x = rng.randrange(size[0]) * tilemap.tile_size
+        y = 0
+        while y < size[1] * tilemap.tile_size and not tilemap.solid_check((x, y)):
+            y += tilemap.tile_size
+        enemies.append(Enemy(g, (x, y - 15), (8, 15)))
+    def run():
+        enemies.update(tilemap, g.player)
+        g.projectiles.clear()   # Shots are not part of this benchmark
+        g.sparks.clear()
+    return run, 1
+
+for count in ENEMY_COUNTS:
+    benchmark('entities.enemy_update x' + str(count), 'fps')(lambda count=count: bench_enemies(count))
+
+# Many playing animations started at different times, one call is a step of the clock and the images of all of them looked up for rendering
+def bench_animations(count):
+    animations = [game().assets['player/run'], game().assets['enemy/idle']]
+    playbacks = []
+    for i in range(count):
+        playbacks.append(animations[i % 2].play())
+        ANIM_CLOCK.tick()
+    def run():
+        ANIM_CLOCK.tick()
+        for playback in playbacks:
+            playback.img(flip=True)
+    return run, 1
+
+benchmark('entities.animations x1000', 'fps')(lambda: bench_animations(1000))
+
+# --- EFFECTS ---
+
+# A steady stream of particles, a few hundred alive at a time, updated and rendered every frame
+def bench_particles():
+    g = game()
+    particles = g.particles
+    particles.clear()
+    surf = pygame.Surface(DISPLAY_SIZE, pygame.SRCALPHA)
+    rng = random.Random(3)
+    def run():
+        for i in range(20):
+            particles.spawn('particle', (rng.random() * DISPLAY_SIZE[0], rng.random() * DISPLAY_SIZE[1]), velocity=(rng.random() - 0.5, rng.random() - 0.5), frame=rng.randint(0, 7))
+        particles.update()
+        particles.render(surf)
+    return run, 1
+
+def bench_sparks():
+    sparks = game().sparks
+    sparks.clear()
+    surf = pygame.Surface(DISPLAY_SIZE, pygame.SRCALPHA)
+    rng = random.Random(4)
+    def run():
+        for i in range(10):
+            sparks.spawn((rng.random() * DISPLAY_SIZE[0], rng.random() * DISPLAY_SIZE[1]), rng.random() * 6.28, 2 + rng.random())
+        sparks.update()
+        sparks.render(surf)
+    return run, 1
+
+benchmark('effects.particles', 'fps')(bench_particles)
+benchmark('effects.sparks', 'fps')(bench_sparks)
+
+# --- BACKGROUND ---
+
+# Clouds drifting while the camera pans, one call is one frame
+def bench_clouds(count):
+    surf = pygame.Surface(DISPLAY_SIZE)
+    clouds = Clouds(game().assets['clouds'], DISPLAY_SIZE, count=count, rng=random.Random(5))
+    state = [0]
+    def run():
+        state[0] += 1
+        clouds.update()
+        clouds.render(surf, offset=(state[0] * 0.7, state[0] * 0.3))
+    return run, 1
+
+for count in [16, 256]:
+    benchmark('background.clouds x' + str(count), 'fps')(lambda count=count: bench_clouds(count))
+
+# --- OUTLINES ---
+
+# The tilemap is drawn on the display along a camera path and outlined, one call is one frame
+# Drawing is part of it as the sprite mode does some of its work there, handing every image to the outliner
+def bench_outline(mode):
+    size = MAP_SIZES[1]
+    tilemap = bench_map(size)
+    offsets = camera_path(tilemap, size)
+    display = pygame.Surface(DISPLAY_SIZE, pygame.SRCALPHA)
+    display_2 = pygame.Surface(DISPLAY_SIZE)
+    outliner = Outliner(DISPLAY_SIZE, mode=mode)
+    state = [0]
+    def run():
+        state[0] = (state[0] + 1) % len(offsets)
+        display.fill((0, 0, 0, 0))
+        tilemap.render(display, offset=offsets[state[0]], outline=outliner.recorder())
+        outliner.render(display, display_2)
+    return run, 1
+
+for mode in Outliner.MODES:
+    benchmark('outline.' + mode, 'fps')(lambda mode=mode: bench_outline(mode))
+
+# --- TRANSITIONS ---
+
+# Goes through the whole closing and opening of the screen, one call is one frame
+def bench_transition(style):
+    display = pygame.Surface(DISPLAY_SIZE, pygame.SRCALPHA)
+    transition = Transition(DISPLAY_SIZE, style=style)
+    timers = [timer for timer in range(-transition.length, transition.length + 1) if timer]
+    state = [0]
+    def run():
+        state[0] = (state[0] + 1) % len(timers)
+        transition.render(display, timers[state[0]])
+    return run, 1
+
+for style in Transition.STYLES:
+    benchmark('transition.' + style, 'fps')(lambda style=style: bench_transition(style))
+
+# --- RUNNING ---
+
+# A fixed mix of Python and blitting work that is timed once at the start of a run, the results are compared relative to it
+# so that the machine being busier or slower overall than when the baseline was saved doesn't show up as a regression
+def bench_calibration():
+    src = pygame.Surface((32, 32))
+    dst = pygame.Surface((128, 128))
+    values = list(range(256))
+    def run():
+        total = 0
+        for value in values:
+            total += value >> 2 & 3
+        for i in range(16):
+            dst.blit(src, (i * 4, i * 4))
+    return run, 1
+
+# Calls the function in batches until min_time has passed, the best of the repeats is the result
+def measure(run, ops, min_time, repeats):
+    run()   # Warming up caches and such
+    best = 0
+    for i in range(repeats):
+        calls = 0
+        start = time.perf_counter()
+        elapsed = 0
+        while elapsed < min_time:
+            run()
+            calls += 1
+            elapsed = time.perf_counter() - start
+        best = max(best, calls * ops / elapsed)
+    return best
+
+def run_benchmarks(selected, min_time, repeats):
+    for name, unit, setup in selected:
+        run, ops = setup()
+        yield name, unit, measure(run, ops, min_time, repeats)
+
+# Name of the CPU, platform.processor() is empty on most Linux machines so it is read from /proc/cpuinfo there
+def cpu_model():
+    if os.path.exists('/proc/cpuinfo'):
+        f = open('/proc/cpuinfo')
+        lines = f.readlines()
+        f.close()
+        for line in lines:
+            if line.startswith('model name'):
+                return line.split(':', 1)[1].strip()
+    return platform.processor()
+
+# The kind of machine the results were measured on, results are only comparable between the same kind
+# The host name is left out, CI runners get a new one for every run while the hardware and the versions stay the same
+def machine_info():
+    return {'cpu': cpu_model(), 'cores': os.cpu_count(), 'machine': platform.machine(), 'system': platform.system(), 'python': platform.python_version(), 'pygame': pygame.version.ver}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks for the hot paths of the game')
+    parser.add_argument('filter', nargs='*', help='only run the benchmarks with any of these in their name')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline file to compare against')
+    parser.add_argument('--update-baseline', '--save-baseline', action='store_true', help='save the results as the baseline of this machine, only the benchmarks that were run are replaced')
+    parser.add_argument('--tolerance', type=float, default=0.4, help='how much slower than the baseline is still fine, 0.4 = 40%%, lower it on a quiet machine')
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds to run each benchmark for per repeat')
+    parser.add_argument('--repeats', type=int, default=5, help='the best of the repeats is the result, more repeats give steadier numbers')
+    parser.add_argument('--quick', action='store_true', help='one short repeat per benchmark, for checking that everything runs, never fails on the results')
+    parser.add_argument('--strict', action='store_true', help='also fail when there is no baseline or it was saved on another kind of machine, for CI')
+    parser.add_argument('--json', metavar='FILE', help='write the results to a JSON file')
+    args = parser.parse_args()
+    if args.quick:
+        args.min_time, args.repeats = 0.05, 1
+
+    init_headless()
+    selected = [bench for bench in BENCHMARKS if not args.filter or any(text in bench[0] for text in args.filter)]
+    info = machine_info()
+
+    baseline = {'info': {}, 'results': {}, 'calibration': {}}
+    if os.path.exists(args.baseline):
+        f = open(args.baseline)
+        baseline.update(json.load(f))
+        f.close()
+    # Only a baseline saved on the same kind of machine with the same Python and pygame can fail the run, older baselines without the CPU never do
+    same_machine = baseline['info'] == info
+    compare = {} if args.update_baseline else baseline['results']
+
+    # Timed for longer than the benchmarks, a bad calibration would throw off every comparison
+    speed = measure(*bench_calibration(), args.min_time * 2, args.repeats * 2)
+
+    results = {}
+    calibration = {}    # The calibration of the run each result was measured in, kept per benchmark as --update-baseline can save some benchmarks from one run and some from another
+    regressions = []
+    print('{:<42}{:>14}  {:<8}{:>14}{:>9}'.format('benchmark', 'result', 'unit', 'baseline', 'change'))
+    for name, unit, value in run_benchmarks(selected, args.min_time, args.repeats):
+        results[name] = value
+        calibration[name] = speed
+        line = '{:<42}{:>14.1f}  {:<8}'.format(name, value, unit)
+        if name in compare:
+            # The baseline scaled by how fast the machine is now compared to when it was saved
+            expected = compare[name] * speed / baseline['calibration'][name] if name in baseline['calibration'] else compare[name]
+            change = value / expected - 1
+            line += '{:>14.1f}{:>+8.0%}'.format(expected, change)
+            if change < -args.tolerance:
+                regressions.append(name)
+                line += '  REGRESSION'
+        print(line)
+        sys.stdout.flush()
+
+    if args.update_baseline:
+        # Replacing the whole baseline if it is from another machine, otherwise only the benchmarks that were run
+        if not same_machine:
+            baseline = {'info': info, 'results': {}, 'calibration': {}}
+        baseline['results'].update(results)
+        baseline['calibration'].update(calibration)
+        f = open(args.baseline, 'w')
+        json.dump(baseline, f, indent=2)
+        f.close()
+        print('Saved the baseline of this machine to', args.baseline)
+    elif not baseline['results']:
+        print('No baseline to compare against, save one for this machine with --update-baseline')
+    if args.json:
+        f = open(args.json, 'w')
+        json.dump({'info': info, 'results': results, 'calibration': calibration}, f, indent=2)
+        f.close()
+
+    failed = False
+    if regressions:
+        print(len(regressions), 'benchmarks are more than {:.0%} slower than the baseline:'.format(args.tolerance), ', '.join(regressions))
+        if not same_machine:
+            print('Not failing, the baseline was saved on another kind of machine or with another Python or pygame, save one for this machine with --update-baseline')
+        elif args.quick:
+            print('Not failing, --quick runs are too short to compare')
+        else:
+            failed = True
+    # Without these checks a CI run on a new kind of runner would pass without comparing anything
+    if args.strict and not args.update_baseline:
+        if not baseline['results']:
+            print('Failing, --strict needs a baseline to compare against')
+            failed = True
+        elif not same_machine:
+            changed = sorted(key for key in set(info) | set(baseline['info']) if baseline['info'].get(key) != info.get(key))
+            print('Failing, --strict and the baseline was saved on another kind of machine, different:', ', '.join(changed))
+            failed = True
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,88 @@
+import os
+import random
+
+import pygame
+
+from scripts.utils import Animation, NullSound
+from scripts.entities import Player
+from scripts.particle import ParticleSystem
+from scripts.spark import SparkSystem
+from scripts.projectile import ProjectilePool
+from scripts.rng import GameRandom
+
+# Made up assets and maps for the benchmarks, so they don't need the 'data' folder and every run works on exactly the same input
+# The images are plain coloured rectangles of the same sizes as the real assets
+
+# Sets up pygame without a window, images can only be converted once a display mode is set
+def init_headless():
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.display.init()
+    pygame.display.set_mode((1, 1))
+
+def make_image(size, color):
+    img = pygame.Surface(size)
+    img.fill(color)
+    img.set_at((0, 0), (0, 0, 0))   # A transparent corner like the real tiles have
+    img = img.convert()
+    img.set_colorkey((0, 0, 0))
+    return img
+
+def make_images(count, size, color):
+    return [make_image(size, (color[0], color[1], (color[2] + i * 20) % 256 or 1)) for i in range(count)]
+
+def make_assets():
+    return {
+        'decor': make_images(4, (16, 16), (120, 160, 60)),
+        'grass': make_images(9, (16, 16), (60, 180, 60)),
+        'large_decor': make_images(3, (32, 32), (60, 120, 60)),
+        'stone': make_images(9, (16, 16), (140, 140, 150)),
+        'player': make_image((8, 15), (200, 200, 255)),
+        'clouds': make_images(2, (64, 24), (220, 220, 230)),
+        'enemy/idle': Animation(make_images(8, (14, 18), (255, 60, 60)), img_dur=6),
+        'enemy/run': Animation(make_images(8, (14, 18), (255, 90, 60)), img_dur=4),
+        'player/idle': Animation(make_images(8, (14, 18), (60, 60, 255)), img_dur=6),
+        'player/run': Animation(make_images(8, (14, 18), (60, 90, 255)), img_dur=4),
+        'player/jump': Animation(make_images(1, (14, 18), (60, 120, 255))),
+        'player/slide': Animation(make_images(1, (14, 18), (60, 150, 255))),
+        'player/wall_slide': Animation(make_images(1, (14, 18), (60, 180, 255))),
+        'particle/leaf': Animation(make_images(18, (5, 5), (80, 200, 80)), img_dur=20, loop=False),
+        'particle/particle': Animation(make_images(4, (3, 3), (255, 255, 255)), img_dur=6, loop=False),
+        'gun': make_image((10, 5), (90, 90, 90)),
+        'projectile': make_image((5, 3), (255, 255, 90)),
+    }
+
+# Enough of the game for the tilemap, the entities and the effects to run, like the editor is for the tilemap
+class BenchGame:
+    def __init__(self, seed=0):
+        self.assets = make_assets()
+        self.sfx = {name: NullSound() for name in ['jump', 'dash', 'hit', 'shoot', 'ambience']}
+        self.rng = GameRandom(seed)
+        self.particles = ParticleSystem(self)
+        self.sparks = SparkSystem()
+        self.projectiles = ProjectilePool()
+        self.player = Player(self, (0, 0), (8, 15))
+        self.dead = 0
+        self.screenshake = 0
+
+# Fills the tilemap with a width x height tile level: rolling stone ground with grass on top, floating platforms and decor
+# The same seed always gives the same level
+def make_map(tilemap, width, height, seed=0):
+    rng = random.Random(seed)
+    ground = height * 2 // 3
+    for x in range(width):
+        ground = max(height // 3, min(height - 2, ground + rng.choice([-1, 0, 0, 0, 1])))
+        tilemap.set_tile((x, ground), 'grass', 0)
+        for y in range(ground + 1, height):
+            tilemap.set_tile((x, y), 'stone', 0)
+        if rng.random() < 0.1:
+            tilemap.offgrid_tiles.add({'type': 'decor', 'variant': rng.randrange(4), 'pos': [x * tilemap.tile_size + rng.random() * 8, (ground - 1) * tilemap.tile_size]})
+        if rng.random() < 0.03:
+            tilemap.offgrid_tiles.add({'type': 'large_decor', 'variant': rng.randrange(3), 'pos': [x * tilemap.tile_size, (ground - 2) * tilemap.tile_size]})
+
+    for i in range(width * height // 200):
+        x, y = rng.randrange(width), rng.randrange(height // 3)
+        for dx in range(rng.randint(2, 8)):
+            tilemap.set_tile((x + dx, y), 'grass', 0)
+
+    tilemap.autotile()
+    return tilemap
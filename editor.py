@@ -2,9 +2,8 @@ import sys
 import pygame
 
 from scripts.utils import load_images
-from scripts.tilemap import Tilemap
-
-RENDER_SCALE = 2.0
+from scripts.tilemap import Tilemap, AUTOTILE_TYPES
+from scripts.presenter import Presenter
 
 class Editor:
     def __init__(self):
@@ -12,9 +11,12 @@ class Editor:
         pygame.init()
 
         pygame.display.set_caption('editor')
-        self.screen = pygame.display.set_mode((640, 480))   
+        self.screen = pygame.display.set_mode((640, 480), pygame.RESIZABLE)
         self.display = pygame.Surface((320, 240))      
 
+        # Scales the display on to the window like in the game, see presenter.py
+        self.presenter = Presenter(self.display.get_size())
+
         self.clock = pygame.time.Clock()
 
         self.assets = {
@@ -63,7 +65,7 @@ class Editor:
 
             # Mouse position
             mpos = pygame.mouse.get_pos()
-            mpos = (mpos[0] / RENDER_SCALE, mpos[1] / RENDER_SCALE)     # The screen is not 1:1 so you must take this in account with mouse position aswell
+            mpos = self.presenter.to_frame(mpos)    # The screen is not 1:1 so you must take this in account with mouse position aswell
             tile_pos = (int((mpos[0] + self.scroll[0]) // self.tilemap.tile_size ), int((mpos[1] + self.scroll[1]) // self.tilemap.tile_size))  # Aligns the tile_pos into the grid
 
             # Showing the place where to set the tile, taking account the grid snapping
@@ -72,20 +74,22 @@ class Editor:
             else:
                 self.display.blit(current_tile_img, mpos)
 
-            # Adding a tile on to the grid
+            # Adding a tile on to the grid, the tile and its neighbors are autotiled right away
+            # Holding the mouse over an autotiled tile of the same type does nothing, otherwise the chosen variant and the autotiled one would swap every frame
             if self.clicking and self.ongrid:
-                self.tilemap.tilemap[str(tile_pos[0]) + ';' + str(tile_pos[1])] = {'type': self.tile_list[self.tile_group], 'variant': self.tile_variant, 'pos': tile_pos}
+                current_tile = self.tilemap.get_tile(tile_pos)
+                tile_type = self.tile_list[self.tile_group]
+                if not current_tile or current_tile['type'] != tile_type or (tile_type not in AUTOTILE_TYPES and current_tile['variant'] != self.tile_variant):
+                    self.tilemap.set_tile(tile_pos, tile_type, self.tile_variant)
+                    self.tilemap.autotile_around(tile_pos)
             
             # Deleting tiles
             if self.right_clicking:
-                tile_loc = str(tile_pos[0]) + ';' + str(tile_pos[1])
-                if tile_loc in self.tilemap.tilemap:    # Position being right clicked "exists" in the tilemapping
-                    del self.tilemap.tilemap[tile_loc]  # Deleting an ongrid tile
-                for tile in self.tilemap.offgrid_tiles.copy():  # SYSTEM TAXING WAY TO, DELETE OFFGRID TILES
-                    tile_img = self.assets[tile['type']][tile['variant']]
-                    tile_r = pygame.Rect(tile['pos'][0] - self.scroll[0], tile['pos'][1] - self.scroll[1], tile_img.get_width(), tile_img.get_height()) # Collision rectangles for every tile in the offgrid tilemap
-                    if tile_r.collidepoint(mpos):   # Check if the created rectangle collides with point on mouse cursor
-                        self.tilemap.offgrid_tiles.remove(tile)
+                if self.tilemap.remove_tile(tile_pos):  # Deleting an ongrid tile, if the position being right clicked "exists" in the tilemapping
+                    self.tilemap.autotile_around(tile_pos)  # The neighbors lost a neighbor
+                # Deleting the offgrid tiles under the mouse cursor, the spatial index only checks the tiles near the cursor
+                for serial in self.tilemap.offgrid_tiles.query_point((mpos[0] + self.scroll[0], mpos[1] + self.scroll[1])):
+                    self.tilemap.offgrid_tiles.remove(serial)
 
             self.display.blit(current_tile_img, (5, 5))
 
@@ -98,12 +102,15 @@ class Editor:
                     pygame.quit()
                     sys.exit()
 
+                if event.type == pygame.VIDEORESIZE:
+                    self.presenter.resize()
+
                 # Mouse
                 if event.type == pygame.MOUSEBUTTONDOWN:
                     if event.button == 1:   # LMB
                         self.clicking = True
                         if not self.ongrid: # Placing ONE offgrid tile (not on every frame)
-                            self.tilemap.offgrid_tiles.append({'type': self.tile_list[self.tile_group], 'variant': self.tile_variant, 'pos': (mpos[0] + self.scroll[0], mpos[1] + self.scroll[1])})
+                            self.tilemap.offgrid_tiles.add({'type': self.tile_list[self.tile_group], 'variant': self.tile_variant, 'pos': (mpos[0] + self.scroll[0], mpos[1] + self.scroll[1])})
                     if event.button == 3:   # RMB
                         self.right_clicking = True
                     if self.shift == True:
@@ -158,8 +165,8 @@ class Editor:
                         self.shift = False
 
             # --- RENDERING AND UPDATING ---
-            self.screen.blit(pygame.transform.scale(self.display, self.screen.get_size()), (0, 0))
-            pygame.display.update()
+            self.presenter.present(self.display, camera=render_scroll)
+            self.presenter.flip()
             self.clock.tick(60)
 
 Editor().run()
\ No newline at end of file
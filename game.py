@@ -3,35 +3,89 @@
 
 import os
 import sys
+import time
 import random
 import math
+import argparse
 
 import pygame
 
-from scripts.spark import Spark
-from scripts.utils import load_image, load_images, Animation
+from scripts.spark import SparkSystem
+from scripts.utils import load_image, load_images, load_sound, Animation, ANIM_CLOCK
 from scripts.entities import PhysicsEntity, Player, Enemy
-from scripts.tilemap import Tilemap
+from scripts.level_loader import LevelLoader
 from scripts.clouds import Clouds
-from scripts.particle import Particle
+from scripts.particle import ParticleSystem
+from scripts.projectile import ProjectilePool
+from scripts.enemy_ai import EnemyAI
+from scripts.collisions import SpatialHash
+from scripts.outline import Outliner
+from scripts.transition import Transition
+from scripts.input_script import random_script
+from scripts.rng import GameRandom, new_seed
+from scripts.replay import InputRecorder, Replay, state_digest, MAX_SEED
+from scripts.profiler import FrameProfiler
+from scripts.presenter import Presenter, SCALE_MODES
+
+# The game is simulated at a fixed rate, so physics behave the same on every machine, and rendered as fast as possible up to MAX_FPS
+SIM_RATE = 60                   # Simulation steps per second, all the speeds and timers in the game are per step
+SIM_STEP = 1000 / SIM_RATE      # Milliseconds
+MAX_FPS = 240                   # Rendering rate limit, 0 for no limit
+MAX_STEPS = 5                   # Most simulation steps done to catch up after a slow frame, after that the game slows down instead
+PROFILE_TRACE_PATH = 'profile_trace.json'   # Where F4 saves the captured profiler trace
+DISPLAY_SIZE = (320, 240)       # Size of the game's rendering surface, in game pixels
+WINDOW_SIZE = (640, 480)        # Starting size of the window, the window can be resized while playing
 
 class Game:
-    def __init__(self):
+    def __init__(self, max_fps=MAX_FPS, max_steps=MAX_STEPS, headless=False, level=0, seed=None, record=None, profile=None, window_size=WINDOW_SIZE, scale_mode='fit'):
 
         # --- GAME SETUP ---
 
-        pygame.init()
+        # Headless mode is for running the simulation without a window or sounds, as fast as the computer can, see simulate()
+        # A display is still needed for loading the images, SDL's dummy video driver gives one that shows nothing
+        self.headless = headless
+        if headless:
+            os.environ['SDL_VIDEODRIVER'] = 'dummy'
+            pygame.display.init()   # Only the display, no mixer so the sounds are loaded as silent stand-ins
+        else:
+            pygame.init()
 
         # Text to be displayed on the window
         pygame.display.set_caption('ninja game')
 
         # Sets up the window and the rendering surface for the game, smaller rendering surface is upscaled to fit the window
-        self.screen = pygame.display.set_mode((640, 480))           # The window for the game
-        self.display = pygame.Surface((320, 240), pygame.SRCALPHA)  # The surface in the game for rendering stuff
-        self.display_2 = pygame.Surface((320, 240))                 # For the outlines, things rendered on to display_2 won't get the outlines
+        self.screen = pygame.display.set_mode(window_size, 0 if headless else pygame.RESIZABLE)   # The window for the game
+        self.display = pygame.Surface(DISPLAY_SIZE, pygame.SRCALPHA)    # The surface in the game for rendering stuff
+        self.display_2 = pygame.Surface(DISPLAY_SIZE)                   # For the outlines, things rendered on to display_2 won't get the outlines
+
+        # Scales display_2 on to the window, only the parts that changed while the camera stands still, see presenter.py
+        self.presenter = Presenter(DISPLAY_SIZE, mode=scale_mode)
+
+        # Outlines for everything on display, drawn on to display_2
+        self.outline = Outliner(self.display.get_size())
+
+        # The effect between the levels, all its frames are drawn here once, see transition.py
+        self.transition_effect = Transition(self.display.get_size())
+
+        # All the randomness in the game comes from the seed, so the same seed and input play out the same way every time
+        self.seed = new_seed() if seed is None else seed
+        self.rng = GameRandom(self.seed)
+
+        # Input of every simulation step is saved to the file given in "record", see replay.py
+        self.recorder = InputRecorder(record, self.seed, level) if record else None
+
+        # Time spent in every stage of the game loop, F3 shows it on the screen and F4 captures a trace, see profiler.py
+        # If "profile" is given the whole run is captured and the trace saved there when the game is closed
+        self.profiler = FrameProfiler()
+        self.show_profiler = False
+        self.trace_path = profile or PROFILE_TRACE_PATH
+        if profile:
+            self.profiler.start_capture()
 
         # Internal clock for the game loop ie. "fps"
         self.clock = pygame.time.Clock()
+        self.max_fps = max_fps
+        self.max_steps = max_steps
 
         # Loading images for entities
         self.assets = {
@@ -57,11 +111,11 @@ class Game:
 
         # Loading sound effects, Pygame works best with .wav files
         self.sfx = {
-            'jump': pygame.mixer.Sound('data/sfx/jump.wav'),
-            'dash': pygame.mixer.Sound('data/sfx/dash.wav'),
-            'hit': pygame.mixer.Sound('data/sfx/hit.wav'),
-            'shoot': pygame.mixer.Sound('data/sfx/shoot.wav'),
-            'ambience': pygame.mixer.Sound('data/sfx/ambience.wav'),
+            'jump': load_sound('data/sfx/jump.wav'),
+            'dash': load_sound('data/sfx/dash.wav'),
+            'hit': load_sound('data/sfx/hit.wav'),
+            'shoot': load_sound('data/sfx/shoot.wav'),
+            'ambience': load_sound('data/sfx/ambience.wav'),
         }
 
         # Setting sound effect volumes
@@ -74,47 +128,60 @@ class Game:
         # Player entity
         self.player = Player(self, (50, 50), (8, 15))      # The third parameter is the starting position
         self.movement = [False, False]
+        self.actions = []   # Jumps and dashes pressed, done on the next simulation step
 
         # --- GAME MAP ---
 
-        self.clouds = Clouds(self.assets['clouds'], count=16)
+        self.clouds = Clouds(self.assets['clouds'], self.display_2.get_size(), count=16, rng=self.rng.clouds)
+
+        # Levels are parsed in the background while the transition plays, see level_loader.py
+        self.level_loader = LevelLoader(self)
+
+        self.particles = ParticleSystem(self)
+        self.sparks = SparkSystem()
 
-        self.tilemap = Tilemap(self, tile_size=16)
+        # Enemy bullets, reused from a pool instead of making new ones for every shot
+        self.projectiles = ProjectilePool()
+
+        # Broad-phase collisions between the player, enemies and projectiles, filled again every frame
+        self.collisions = SpatialHash(cell_size=32)
         
-        self.level = 0
+        self.level = level
+        self.levels_cleared = 0     # Counted when the transition after the last enemy loads the next level, not when a death reloads the level
         self.load_level(self.level)
 
         self.screenshake = 0
 
     def load_level(self, map_id):
-        self.tilemap.load('data/maps/' + str(map_id) + '.json')
+        # Swapping in the level prepared by the loader, the map is already parsed and the spawners extracted
+        level = self.level_loader.get(map_id)
+        self.tilemap = level.tilemap
 
         # --- PARTICLES ---
 
-        self.leaf_spawners = []
-        for tree in self.tilemap.extract([('large_decor', 2)], keep=True):
-            self.leaf_spawners.append(pygame.Rect(4 + tree['pos'][0], 4 + tree['pos'][1], 23, 13))  # Rectangle here in this size makes sense for the tree tile
+        self.leaf_spawners = level.leaf_spawners
 
         # --- ENTITY SPAWNERS ---
 
-        self.enemies = []
+        self.enemies = EnemyAI(self)    # A list of the enemies that also runs their AI for all of them at once, see enemy_ai.py
 
-        for spawner in self.tilemap.extract([('spawners', 0), ('spawners', 1)]):
+        for spawner in level.spawners:
             if spawner['variant'] == 0:
-                self.player.pos = spawner['pos']
+                self.player.teleport(spawner['pos'])
                 self.player.air_time = 0    # Resets the falling time after falling off the screen
             else:
                 self.enemies.append(Enemy(self, spawner['pos'], (8, 15)))
 
         # --- LISTS FOR SMALL STUFF ---
 
-        self.projectiles = []
-        self.particles = []
-        self.sparks = []
+        self.projectiles.clear()
+        self.particles.clear()
+        self.sparks.clear()
 
         # --- CAMERA ---
 
         self.scroll = [0, 0]
+        self.prev_scroll = [0, 0]   # Camera position before the last simulation step, for blending when rendering
 
         # --- PLAYER ENTITY STATE ---
 
@@ -127,7 +194,8 @@ class Game:
 
     # --- GAMELOOP ---
 
-    def run(self):
+    # If a script is given (for example a replay) the simulation steps take their input from it instead of the keyboard until it runs out
+    def run(self, script=None):
 
         # Game music and ambience
         pygame.mixer.music.load('data/music.wav')
@@ -135,163 +203,336 @@ class Game:
         pygame.mixer.music.play(-1)
         self.sfx['ambience'].play(-1)
 
-        # Gameloop, in this case everything in one loop, you could have one for fisiks, one for logic and so on
+        # Gameloop, the simulation runs in fixed steps of SIM_STEP and the rendering as often as the machine manages
+        # Time passed since the last frame is saved up in the accumulator and spent one simulation step at a time, the leftover is used to blend the rendered positions between the last two steps
+        accumulator = 0
+        script = iter(script) if script is not None else None
         while True:
-
-            # --- RENDERING ---
-            # Later rendered entities overlap the previously rendered
-
-            # Fill the whole screen with transparency
-            self.display.fill((0, 0, 0, 0))
-            # Fills the whole screen with background image at the start of every frame to "clean", otherwise all moved sprites would leave traces 
-            self.display_2.blit(self.assets['background'], (0, 0))
-
-            # Screenshake, defaults back to 0 in few moments
-            self.screenshake = max(0, self.screenshake - 1)
-
-            # Level transition timer and logic for completing a level (enemy list is empty)
-            if not len(self.enemies):
-                self.transition += 1
-                if self.transition > 30:
-                    self.level = min(self.level + 1, len(os.listdir('data/maps')) - 1)      # No loading levels that do not exist
-                    self.load_level(self.level)
-            if self.transition < 0:
-                self.transition += 1
-
-            # Player death
-            if self.dead:   # Timer starts after player death
-                self.dead += 1
-                if self.dead >= 10:     # Triggers the transition
-                    self.transition = min(30, self.transition + 1)  # This prevents this trigger from adding to level count
-                if self.dead > 40:      # Loading level 0 after 40 frames of death
-                    self.load_level(self.level)
-
-            # Moves the camera centering on the player with smoothing
-            self.scroll[0] += (self.player.rect().centerx - self.display.get_width() / 2 - self.scroll[0]) / 30
-            self.scroll[1] += (self.player.rect().centery - self.display.get_height() / 2 - self.scroll[1]) / 30
-            # Removes the player character jitter releated to camera movement by removing decimal handling with casting to integer, camera "choppines" remains
-            render_scroll = (int(self.scroll[0]), int(self.scroll[1]))
-
-            for rect in self.leaf_spawners:
-                if random.random() * 49999 < rect.width * rect.height:   # Generate random number and compare it to the spawner's size so bigger spawners get spawn more particles, 49999 affects spawn rate per frame
-                    pos = (rect.x + random.random() * rect.width, rect.y + random.random() * rect.height)   # Randomizes the position within the spawner
-                    self.particles.append(Particle(self, 'leaf', pos, velocity=[0.05, 0.3], frame=random.randint(0, 20)))   # Randomizes the starting leaf frame aswell, AFAIK not working atm the moment
-
-            self.clouds.update()
-            self.clouds.render(self.display_2, offset=render_scroll)
-
-            self.tilemap.render(self.display, offset=render_scroll)
-
-            for enemy in self.enemies.copy():
-                kill = enemy.update(self.tilemap, (0, 0))
-                enemy.render(self.display, offset=render_scroll)
-                if kill:
-                    self.enemies.remove(enemy)
-
-            if not self.dead:   # No player rendering if dead
-                self.player.update(self.tilemap, (self.movement[1] - self.movement[0], 0))
-                self.player.render(self.display, offset=render_scroll)
-
-            # --- PROJECTILES ---
-
-            # Outline for projectile[[x, y], direction, timer]
-            for projectile in self.projectiles.copy():
-                projectile[0][0] += projectile[1]   # Adding the projectile speed to the projectile's x-axis position
-                projectile[2] += 1                  # Adding to the projectile timer
-                img = self.assets['projectile']
-                self.display.blit(img, (projectile[0][0] - img.get_width() / 2 - render_scroll[0], projectile[0][1] - img.get_height() / 2 - render_scroll[1]))
-                if self.tilemap.solid_check(projectile[0]):     # Deleting the projectile if hitting wall
-                    self.projectiles.remove(projectile)
-                    for i in range(4):
-                            # Sparks to the opposing direction of projectile
-                            self.sparks.append(Spark(projectile[0], random.random() - 0.5 + (math.pi if projectile[1] > 0 else 0), 2 + random.random()))
-                elif projectile[2] > 360:                       # Deleting the projectile if timing out in 6s
-                    self.projectiles.remove(projectile)
-                elif abs(self.player.dashing) < 50:             # Player can dash through projectiles
-                    if self.player.rect().collidepoint(projectile[0]):      # Deleting the projectile if hitting player
-                        self.projectiles.remove(projectile)
-                        self.dead += 1
-                        self.sfx['hit'].play()
-                        self.screenshake = max(16, self.screenshake)  # Allows the bigger screenshakes to override the smaller ones
-                        for i in range(30):     # Sparks and particles on player hit
-                            angle = random.random() * math.pi * 2   # Random angle in a circle
-                            speed = random.random() * 5
-                            self.sparks.append(Spark(self.player.rect().center, angle, 2 + random.random()))
-                            self.particles.append(Particle(self, 'particle', self.player.rect().center, velocity=[math.cos(angle + math.pi) * speed * 0.5, math.sin(angle + math.pi) * speed * 0.5], frame=random.randint(0, 7)))
-
-            # --- SPARKS ---
-
-            for spark in self.sparks.copy():
-                kill = spark.update()
-                spark.render(self.display, offset=render_scroll)
-                if kill:
-                    self.sparks.remove(spark)
-
-            # --- OUTLINES ---
-
-            # Mask from the dipslay with everything that needs the outline
-            display_mask = pygame.mask.from_surface(self.display)
-            display_sillhouette = display_mask.to_surface(setcolor=(0, 0, 0, 180), unsetcolor=(0, 0, 0, 0))
-            for offset in [(-1, 0), (1, 0), (0, -1), (0, 1)]:   # Basicly rendering four dropshadows for everything
-                self.display_2.blit(display_sillhouette, offset)
-
-            # --- PARTICLE MANAGEMENT ---
-
-            for particle in self.particles.copy():
-                kill = particle.update()
-                particle.render(self.display, offset=render_scroll)
-                if particle.type == 'leaf':
-                    particle.pos[0] += math.sin(particle.animation.frame * 0.035) * 0.3     # Gives leaves sine curve patch 
-                if kill:
-                    self.particles.remove(particle) # Remove particles with animation played out
-
-            # --- INPUT READING ---
-
-            # Gets the input and such, preventing the Windows thinking the program has stopped responding
-            for event in pygame.event.get():
-
-                # THE PART WHERE YOU PRESS THE "X" IN WINDOWS WINDOW TO QUIT THE PROGRAM, DO NOT FORGET!
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-
-                # Reading the user input
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_LEFT:
-                        self.movement[0] = True
-                    if event.key == pygame.K_RIGHT:
-                        self.movement[1] = True
-                    if event.key == pygame.K_UP:
-                        if self.player.jump():          # Runs the jumping function and as it is set up to return true if jump happens it can be used to play the sound effect
-                            self.sfx['jump'].play()
-                    if event.key == pygame.K_x:
-                        self.player.dash()
-
-                if event.type == pygame.KEYUP:
-                    if event.key == pygame.K_LEFT:
-                        self.movement[0] = False
-                    if event.key == pygame.K_RIGHT:
-                        self.movement[1] = False
-
-            # --- GAME STATE UPDATING ---
-
-            # Somewhat of a performance hog as a another surface is drawn
-            if self.transition:
-                transition_surf = pygame.Surface(self.display.get_size())
-                # Uses the changing transition value for the radius
-                pygame.draw.circle(transition_surf, (255, 255, 255), (self.display.get_width() // 2, self.display.get_height() // 2), (30 - abs(self.transition)) * 8)
-                transition_surf.set_colorkey((255, 255, 255))   # Makes this surface transparent as the drawn circle is black
-                self.display.blit(transition_surf, (0, 0))
-
-            # Merges the display_2 and display
-            self.display_2.blit(self.display, (0, 0))
-            # Picks random values between screenshake value and 0, defaults back to (0, 0) after few moments
-            screenshake_offset = (random.random() * self.screenshake - self.screenshake / 2, random.random() * self.screenshake - self.screenshake / 2)
-            # Renders the rendering surface on to the window and scale it up
-            self.screen.blit(pygame.transform.scale(self.display_2, self.screen.get_size()), screenshake_offset)
-            # Updates the screen at the start of every loop or "frame"
-            pygame.display.update()
-            # Forces the loop to run at 60 fps
-            self.clock.tick(60)
-
-Game().run()
\ No newline at end of file
+            self.profiler.begin_frame()
+            self.handle_events()
+            self.profiler.lap('events')
+
+            # A frame slower than max_steps simulation steps is not caught up with, otherwise a slow frame would cause even more steps next frame and so on
+            accumulator = min(accumulator + self.clock.tick(self.max_fps), SIM_STEP * self.max_steps)
+            self.profiler.lap('wait')
+            while accumulator >= SIM_STEP:
+                entry = next(script, None) if script is not None else None
+                if entry is not None:
+                    self.actions.clear()    # Keys pressed during the replay are ignored
+                    self.step(*entry)
+                else:
+                    script = None
+                    self.update()
+                accumulator -= SIM_STEP
+
+            self.render(accumulator / SIM_STEP)
+            self.profiler.end_frame()
+
+    # Runs the game without rendering or waiting between the steps, one simulation step per entry of the script
+    # Entries are (movement, actions), see scripts/input_script.py. Returns the number of steps run
+    def simulate(self, script):
+        steps = 0
+        for movement, actions in script:
+            self.step(movement, actions)
+            steps += 1
+        return steps
+
+    # One simulation step with the given input instead of the keyboard
+    def step(self, movement, actions=()):
+        self.movement[0], self.movement[1] = movement
+        self.actions.extend(actions)
+        self.update()
+
+    def save_recording(self):
+        if self.recorder:
+            self.recorder.save()
+
+    def toggle_capture(self):
+        if self.profiler.capturing:
+            events = self.profiler.stop_capture(self.trace_path)
+            print('Saved', events, 'trace events to', self.trace_path)
+        else:
+            self.profiler.start_capture()
+
+    # --- INPUT READING ---
+
+    def handle_events(self):
+        # Gets the input and such, preventing the Windows thinking the program has stopped responding
+        for event in pygame.event.get():
+
+            # THE PART WHERE YOU PRESS THE "X" IN WINDOWS WINDOW TO QUIT THE PROGRAM, DO NOT FORGET!
+            if event.type == pygame.QUIT:
+                self.save_recording()
+                if self.profiler.capturing:
+                    self.toggle_capture()
+                pygame.quit()
+                sys.exit()
+
+            # The frame is fitted on to the new window size
+            if event.type == pygame.VIDEORESIZE:
+                self.presenter.resize()
+                self.screen = self.presenter.screen
+
+            # Reading the user input, jumps and dashes are done on the next simulation step
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_LEFT:
+                    self.movement[0] = True
+                if event.key == pygame.K_RIGHT:
+                    self.movement[1] = True
+                if event.key == pygame.K_UP:
+                    self.actions.append('jump')
+                if event.key == pygame.K_x:
+                    self.actions.append('dash')
+                if event.key == pygame.K_F2:        # Switching between the outline modes for comparing them
+                    self.outline.toggle()
+                if event.key == pygame.K_F3:        # Profiler overlay
+                    self.show_profiler = not self.show_profiler
+                    self.presenter.invalidate()     # The game is drawn over the overlay in full when it goes away
+                if event.key == pygame.K_F4:        # Starting and stopping a profiler trace capture
+                    self.toggle_capture()
+                if event.key == pygame.K_F5:        # Switching between the level transition styles
+                    self.transition_effect.toggle()
+
+            if event.type == pygame.KEYUP:
+                if event.key == pygame.K_LEFT:
+                    self.movement[0] = False
+                if event.key == pygame.K_RIGHT:
+                    self.movement[1] = False
+
+    # --- SIMULATION ---
+
+    # One fixed step of the game, everything here happens exactly the same no matter how fast the game is rendered
+    def update(self):
+        if self.recorder:
+            self.recorder.record(self.movement, self.actions)
+
+        for action in self.actions:
+            if action == 'jump':
+                if self.player.jump():          # Runs the jumping function and as it is set up to return true if jump happens it can be used to play the sound effect
+                    self.sfx['jump'].play()
+            if action == 'dash':
+                self.player.dash()
+        self.actions.clear()
+
+        # Moves every animation in the game forward by one step, see Animation in utils.py
+        ANIM_CLOCK.tick()
+
+        # Screenshake, defaults back to 0 in few moments
+        self.screenshake = max(0, self.screenshake - 1)
+
+        # Level transition timer and logic for completing a level (enemy list is empty)
+        if not len(self.enemies):
+            next_level = min(self.level + 1, self.level_loader.level_count - 1)      # No loading levels that do not exist
+            self.level_loader.prefetch(next_level)      # Loading starts in the background as the transition starts
+            self.transition += 1
+            if self.transition > 30:
+                self.levels_cleared += 1
+                self.level = next_level
+                self.load_level(self.level)
+        if self.transition < 0:
+            self.transition += 1
+
+        # Player death
+        if self.dead:   # Timer starts after player death
+            self.level_loader.prefetch(self.level)      # The level is loaded again from the file in the background
+            self.dead += 1
+            if self.dead >= 10:     # Triggers the transition
+                self.transition = min(30, self.transition + 1)  # This prevents this trigger from adding to level count
+            if self.dead > 40:      # Loading level 0 after 40 frames of death
+                self.load_level(self.level)
+
+        # Moves the camera centering on the player with smoothing
+        self.prev_scroll[0], self.prev_scroll[1] = self.scroll
+        self.scroll[0] += (self.player.rect().centerx - self.display.get_width() / 2 - self.scroll[0]) / 30
+        self.scroll[1] += (self.player.rect().centery - self.display.get_height() / 2 - self.scroll[1]) / 30
+
+        for rect in self.leaf_spawners:
+            if self.rng.leaves.random() * 49999 < rect.width * rect.height:   # Generate random number and compare it to the spawner's size so bigger spawners get spawn more particles, 49999 affects spawn rate per frame
+                pos = (rect.x + self.rng.leaves.random() * rect.width, rect.y + self.rng.leaves.random() * rect.height)   # Randomizes the position within the spawner
+                self.particles.spawn('leaf', pos, velocity=(0.05, 0.3), frame=self.rng.leaves.randint(0, 20))   # Randomizes the starting leaf frame aswell, AFAIK not working atm the moment
+
+        self.clouds.update()
+        self.profiler.lap('update.level')
+
+        self.enemies.update(self.tilemap, self.player)
+        self.profiler.lap('update.enemies')
+
+        if not self.dead:   # No player updating if dead
+            self.player.update(self.tilemap, (self.movement[1] - self.movement[0], 0))
+        self.profiler.lap('update.player')
+
+        # --- PROJECTILES ---
+
+        # Going through the projectiles from the newest, the released ones are dropped from the list after the loop, see projectile.py
+        for projectile in reversed(self.projectiles.active):
+            projectile.move()
+            if self.tilemap.solid_check(projectile.pos):    # Deleting the projectile if hitting wall
+                self.projectiles.release(projectile)
+                for i in range(4):
+                        # Sparks to the opposing direction of projectile
+                        self.sparks.spawn(projectile.pos, self.rng.effects.random() - 0.5 + (math.pi if projectile.direction > 0 else 0), 2 + self.rng.effects.random())
+            elif projectile.timer > 360:                    # Deleting the projectile if timing out in 6s
+                self.projectiles.release(projectile)
+        self.projectiles.compact()
+        self.profiler.lap('update.projectiles')
+
+        # --- COLLISIONS ---
+
+        # Every moving thing is put into the spatial hash, after which only the bodies close to each other are tested
+        self.collisions.clear()
+        self.collisions.insert('player', self.player, self.player.rect())
+        for enemy in self.enemies:
+            self.collisions.insert('enemy', enemy, enemy.rect())
+        for projectile in self.projectiles:
+            self.collisions.insert('projectile', projectile, projectile.rect)
+
+        if abs(self.player.dashing) >= 50:      # Enemies hit by the dashing player
+            for player, enemy in self.collisions.pairs('player', 'enemy'):
+                enemy.hit()
+                self.enemies.remove(enemy)
+        else:                                   # Player can dash through projectiles
+            for player, projectile in self.collisions.pairs('player', 'projectile'):
+                if player.rect().collidepoint(projectile.pos):     # Deleting the projectile if hitting player
+                    self.projectiles.release(projectile)
+                    self.dead += 1
+                    self.sfx['hit'].play()
+                    self.screenshake = max(16, self.screenshake)  # Allows the bigger screenshakes to override the smaller ones
+                    for i in range(30):     # Sparks and particles on player hit
+                        angle = self.rng.effects.random() * math.pi * 2   # Random angle in a circle
+                        speed = self.rng.effects.random() * 5
+                        self.sparks.spawn(self.player.rect().center, angle, 2 + self.rng.effects.random())
+                        self.particles.spawn('particle', self.player.rect().center, velocity=(math.cos(angle + math.pi) * speed * 0.5, math.sin(angle + math.pi) * speed * 0.5), frame=self.rng.effects.randint(0, 7))
+        self.projectiles.compact()
+
+        self.profiler.lap('update.collisions')
+
+        # --- SPARKS AND PARTICLES ---
+
+        # All particles are moved and animated at once, the ones with their animation played out are removed (leaf sine curve path is in particle.py)
+        self.sparks.update()
+        self.particles.update()
+        self.profiler.lap('update.effects')
+
+    # --- RENDERING ---
+
+    # Draws the current state of the game, "alpha" is how far the time is between the last simulation step and the next one
+    def render(self, alpha=1.0):
+        # Later rendered entities overlap the previously rendered
+
+        # Fill the whole screen with transparency
+        self.display.fill((0, 0, 0, 0))
+        # Fills the whole screen with background image at the start of every frame to "clean", otherwise all moved sprites would leave traces 
+        self.display_2.blit(self.assets['background'], (0, 0))
+
+        # Removes the player character jitter releated to camera movement by removing decimal handling with casting to integer, camera "choppines" remains
+        render_scroll = (int(self.prev_scroll[0] + (self.scroll[0] - self.prev_scroll[0]) * alpha), int(self.prev_scroll[1] + (self.scroll[1] - self.prev_scroll[1]) * alpha))
+        self.profiler.lap('render.clear')
+
+        self.clouds.render(self.display_2, offset=render_scroll)
+        self.profiler.lap('render.clouds')
+
+        # Everything drawn on the display hands its images to the outliner too, see outline.py
+        outline = self.outline.recorder()
+
+        self.tilemap.render(self.display, offset=render_scroll, outline=outline)
+        # Rest of the level is baked a few chunks a frame, starting from around the camera, see ChunkCache.bake_some()
+        chunk_px = self.tilemap.chunk_px
+        self.tilemap.render_cache.bake_some(4, near=((render_scroll[0] + self.display.get_width() // 2) // chunk_px, (render_scroll[1] + self.display.get_height() // 2) // chunk_px))
+        self.profiler.lap('render.tilemap')
+
+        for enemy in self.enemies:
+            enemy.render(self.display, offset=render_scroll, alpha=alpha, outline=outline)
+        self.profiler.lap('render.enemies')
+
+        if not self.dead:   # No player rendering if dead
+            self.player.render(self.display, offset=render_scroll, alpha=alpha, outline=outline)
+        self.profiler.lap('render.player')
+
+        img = self.assets['projectile']
+        for projectile in self.projectiles:
+            x = projectile.pos[0] - projectile.direction * (1 - alpha)     # Projectiles only move on the x-axis at a constant speed, so the previous position is known without storing it
+            pos = (x - img.get_width() / 2 - render_scroll[0], projectile.pos[1] - img.get_height() / 2 - render_scroll[1])
+            self.display.blit(img, pos)
+            if outline:
+                outline.add(img, pos)
+        self.profiler.lap('render.projectiles')
+
+        self.sparks.render(self.display, offset=render_scroll, outline=outline)
+        self.profiler.lap('render.sparks')
+
+        # --- OUTLINES ---
+
+        # Basicly rendering four dropshadows for everything on the display, see outline.py
+        self.outline.render(self.display, self.display_2)
+        self.profiler.lap('render.outlines')
+
+        self.particles.render(self.display, offset=render_scroll)
+        self.profiler.lap('render.particles')
+
+        # --- TRANSITION ---
+
+        # Used to be a performance hog as a new surface was drawn every frame, now it is just one blit of a ready frame
+        self.transition_effect.render(self.display, self.transition)
+        self.profiler.lap('render.transition')
+
+        # Merges the display_2 and display
+        self.display_2.blit(self.display, (0, 0))
+        # Picks random values between screenshake value and 0, defaults back to (0, 0) after few moments
+        screenshake_offset = (self.rng.screen.random() * self.screenshake - self.screenshake / 2, self.rng.screen.random() * self.screenshake - self.screenshake / 2)
+        # Renders the rendering surface on to the window and scale it up
+        self.presenter.present(self.display_2, offset=screenshake_offset, camera=render_scroll)
+        self.profiler.lap('render.scale')
+
+        # Drawn on the window after the scaling so the text stays readable
+        overlay = []
+        if self.show_profiler:
+            overlay.append(self.profiler.render(self.screen))
+            self.profiler.lap('render.overlay')
+
+        # Updates the screen at the start of every loop or "frame", only the parts that changed
+        self.presenter.flip(overlay)
+        self.profiler.lap('render.present')
+
+# Seeds are stored in replay files as unsigned 64-bit numbers, so the others are turned down here instead of failing when the replay is saved
+def seed_arg(text):
+    try:
+        seed = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError('the seed must be a whole number, not ' + repr(text))
+    if not 0 <= seed <= MAX_SEED:
+        raise argparse.ArgumentTypeError('the seed must be from 0 to ' + str(MAX_SEED))
+    return seed
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='ninja game')
+    parser.add_argument('--headless', action='store_true', help='simulate without a window, sounds or rendering, with random input unless replaying')
+    parser.add_argument('--steps', type=int, default=3600, help='simulation steps to run in headless mode')
+    parser.add_argument('--seed', type=seed_arg, help='game seed, also used for the random input in headless mode')
+    parser.add_argument('--level', type=int, default=0, help='level to start from')
+    parser.add_argument('--record', metavar='FILE', help='record the input to a replay file')
+    parser.add_argument('--replay', metavar='FILE', help='play a recorded replay file')
+    parser.add_argument('--profile', metavar='FILE', help='capture a profiler trace of the whole run into a Chrome trace file')
+    parser.add_argument('--window', default='{}x{}'.format(*WINDOW_SIZE), help='starting window size as WIDTHxHEIGHT')
+    parser.add_argument('--scale', choices=SCALE_MODES, default='fit', help='how the game is fitted on to the window: stretch to fill it, fit keeping the shape or integer for sharp pixels')
+    args = parser.parse_args()
+    window_size = tuple(int(value) for value in args.window.lower().split('x'))
+
+    # A replay brings its own seed and starting level
+    replay = Replay(args.replay) if args.replay else None
+    seed = replay.seed if replay else args.seed
+    level = replay.level if replay else args.level
+
+    if args.headless:
+        game = Game(headless=True, level=level, seed=seed, record=args.record, profile=args.profile)
+        script = replay.script() if replay else random_script(args.steps, random.Random(game.seed))
+        start = time.perf_counter()
+        steps = game.simulate(script)
+        duration = time.perf_counter() - start
+        game.save_recording()
+        if game.profiler.capturing:
+            game.toggle_capture()
+        print(steps, 'steps in', round(duration, 2), 's,', round(steps / duration), 'steps per second, reached level', game.level)
+        print('seed', game.seed, 'final state', state_digest(game))
+    else:
+        game = Game(level=level, seed=seed, record=args.record, profile=args.profile, window_size=window_size, scale_mode=args.scale)
+        game.run(replay.script() if replay else None)
\ No newline at end of file
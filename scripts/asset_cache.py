@@ -0,0 +1,135 @@
+import json
+import mmap
+import os
+import struct
+import sys
+
+import pygame
+
+# On-disk cache of decoded assets, so starting the game doesn't have to decode every PNG and WAV again
+# The file is a small JSON index followed by raw pixel and sample data, the data is read through mmap straight into pygame
+# Every entry remembers the size and modification time of its source file, changed sources are simply decoded normally
+# Build or refresh the cache with: python -m scripts.asset_cache
+
+CACHE_PATH = 'data/asset_cache.bin'
+MAGIC = b'PGAC'
+VERSION = 1
+HEADER = struct.Struct('<4sII')     # Magic, version, index length
+ALIGN = 16                          # Data blocks start at aligned offsets
+
+# Data blocks come after the header and the index, offsets in the index are counted from here
+def data_start(index_length):
+    start = HEADER.size + index_length
+    return start + -start % ALIGN
+
+def source_stamp(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+class AssetCache:
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+        self.index = None   # Opened on first use
+        self.data = None
+        self.data_start = 0
+
+    def open(self):
+        self.index = {'images': {}, 'sounds': {}}
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return
+        with f:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                return
+            magic, version, index_length = HEADER.unpack(header)
+            if magic != MAGIC or version != VERSION:    # Old or foreign file, ignored until it is built again
+                return
+            self.index = json.loads(f.read(index_length))
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)   # The mapping stays valid after the file is closed
+            self.data_start = data_start(index_length)
+
+    # Entry for the source file if it is in the cache and the source hasn't changed since
+    def entry(self, kind, path):
+        if self.index is None:
+            self.open()
+        entry = self.index[kind].get(path)
+        if entry is None or self.data is None:
+            return None
+        try:
+            if source_stamp(path) != entry['stamp']:
+                return None
+        except FileNotFoundError:
+            return None
+        return entry
+
+    def block(self, entry):
+        start = self.data_start + entry['offset']
+        return memoryview(self.data)[start:start + entry['length']]
+
+    # Surface using the cached pixels, None if not cached
+    def image(self, path):
+        entry = self.entry('images', path)
+        if entry:
+            return pygame.image.frombuffer(self.block(entry), tuple(entry['size']), entry['format'])
+
+    # Sound made of the cached samples, only if the mixer runs in the same format as when the cache was built
+    def sound(self, path):
+        entry = self.entry('sounds', path)
+        if entry and list(pygame.mixer.get_init() or []) == entry['mixer']:
+            return pygame.mixer.Sound(buffer=self.block(entry))
+
+ASSET_CACHE = AssetCache()
+
+# Decodes every image and sound under the data folder and writes them into the cache file
+def build(path=CACHE_PATH, image_dir='data/images', sound_dirs=('data/sfx',)):
+    index = {'images': {}, 'sounds': {}}
+    blocks = []
+    offset = 0
+
+    def add(kind, source, data, **info):
+        nonlocal offset
+        offset += -offset % ALIGN
+        index[kind][source] = dict(info, stamp=source_stamp(source), offset=offset, length=len(data))
+        blocks.append((offset, data))
+        offset += len(data)
+
+    for root, dirs, files in os.walk(image_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith('.png'):
+                source = os.path.join(root, name).replace(os.sep, '/')
+                img = pygame.image.load(source)
+                add('images', source, pygame.image.tobytes(img, 'RGB'), size=img.get_size(), format='RGB')
+
+    mixer = pygame.mixer.get_init()
+    for sound_dir in sound_dirs:
+        if not mixer:   # Without an audio device there is no mixer format to store the samples in
+            break
+        for name in sorted(os.listdir(sound_dir)):
+            if name.lower().endswith('.wav'):
+                source = sound_dir + '/' + name
+                add('sounds', source, pygame.mixer.Sound(source).get_raw(), mixer=list(mixer))
+
+    index_data = json.dumps(index).encode()
+    start = data_start(len(index_data))
+
+    # Written next to the old file first so a running game never sees half a cache
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(index_data)))
+        f.write(index_data)
+        for block_offset, data in blocks:
+            f.seek(start + block_offset)
+            f.write(data)
+    os.replace(tmp_path, path)
+    return index
+
+if __name__ == '__main__':
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.init()
+    index = build(sys.argv[1] if len(sys.argv) > 1 else CACHE_PATH)
+    print('Cached', len(index['images']), 'images and', len(index['sounds']), 'sounds')
+    if not pygame.mixer.get_init():
+        print('No audio device, sounds were not cached')
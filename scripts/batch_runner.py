@@ -0,0 +1,80 @@
+import argparse
+import json
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from scripts.input_script import random_script
+from scripts.level_loader import MAP_DIR, map_ids
+
+# Plays many headless games at once, one process per CPU core, for checking the balance and the speed of every level without playing them by hand
+# Every episode is one map and one seed, the seed decides both the random input and the game's own randomness so an episode can be run again the same way
+# Run from the project root: python -m scripts.batch_runner --seeds 8 --steps 3600
+
+# Runs one episode in a worker process and gives back its stats
+def run_episode(map_id, seed, steps):
+    from game import Game   # Imported here so the main process never starts pygame
+
+    game = Game(headless=True, level=map_id, seed=seed)
+
+    stats = {'map': map_id, 'seed': seed, 'steps': 0, 'frames_survived': None, 'enemies_killed': 0, 'deaths': 0, 'levels_cleared': 0}
+    step_times = []
+    for movement, actions in random_script(steps, random.Random(seed)):
+        enemies = game.enemies
+        enemy_count = len(enemies)
+        dead = game.dead
+        levels_cleared = game.levels_cleared
+
+        start = time.perf_counter()
+        game.step(movement, actions)
+        step_times.append(time.perf_counter() - start)
+        stats['steps'] += 1
+
+        if game.enemies is enemies:     # A new list means the level was loaded again, those enemies were not killed
+            stats['enemies_killed'] += enemy_count - len(game.enemies)
+        # Counted by the game itself, a death after the last enemy also loads the level again without clearing it (and game.level doesn't change after the last level either)
+        stats['levels_cleared'] += game.levels_cleared - levels_cleared
+        if game.dead and not dead:
+            stats['deaths'] += 1
+            if stats['frames_survived'] is None:
+                stats['frames_survived'] = stats['steps']
+
+    if stats['frames_survived'] is None:    # Never died
+        stats['frames_survived'] = stats['steps']
+    step_times.sort()
+    stats['step_ms_mean'] = sum(step_times) / len(step_times) * 1000 if step_times else 0
+    stats['step_ms_p99'] = step_times[int(len(step_times) * 0.99)] * 1000 if step_times else 0
+    stats['step_ms_max'] = step_times[-1] * 1000 if step_times else 0
+    return stats
+
+# Runs every map with every seed in a process pool, the stats of each episode are yielded as soon as it is done
+def run_batch(maps, seeds, steps, workers=None):
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_episode, map_id, seed, steps) for map_id in maps for seed in seeds]
+        for future in as_completed(futures):
+            yield future.result()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Runs headless games for many maps and seeds in parallel')
+    parser.add_argument('--maps', type=int, nargs='*', help='map ids to run, all maps in ' + MAP_DIR + ' by default')
+    parser.add_argument('--seeds', type=int, default=4, help='number of seeds per map, seeds 0 to N-1 are used')
+    parser.add_argument('--steps', type=int, default=3600, help='simulation steps per episode')
+    parser.add_argument('--workers', type=int, help='worker processes, one per CPU core by default')
+    parser.add_argument('--out', help='file to write the stats of every episode to, one JSON object per line')
+    args = parser.parse_args()
+
+    maps = args.maps if args.maps else map_ids()
+    out = open(args.out, 'w') if args.out else None
+    results = []
+    start = time.perf_counter()
+    for stats in run_batch(maps, range(args.seeds), args.steps, args.workers):
+        results.append(stats)
+        print('map {map} seed {seed}: survived {frames_survived}/{steps} frames, {enemies_killed} kills, {deaths} deaths, {step_ms_mean:.3f} ms per step (max {step_ms_max:.2f})'.format(**stats))
+        if out:
+            out.write(json.dumps(stats) + '\n')
+    if out:
+        out.close()
+
+    duration = time.perf_counter() - start
+    total_steps = sum(stats['steps'] for stats in results)
+    print(len(results), 'episodes,', total_steps, 'steps in', round(duration, 2), 's')
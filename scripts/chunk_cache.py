@@ -0,0 +1,80 @@
+from collections import OrderedDict
+
+import pygame
+
+# Pre-rendered surfaces for the tilemap chunks, so that a whole chunk of static tiles can be drawn with one blit instead of one blit per tile
+# Surfaces are kept in least recently used order and the oldest ones are thrown away when the memory budget runs out, they are simply baked again when needed
+class ChunkCache:
+    def __init__(self, tilemap, budget=16 * 1024 * 1024):
+        self.tilemap = tilemap
+        self.budget = budget            # Bytes of pixel data allowed to stay in memory
+        self.surfaces = OrderedDict()   # Chunk position -> baked surface, the most recently used at the end
+        self.used = 0
+        self.unbaked = None             # Chunks still to be baked by bake_some(), the farthest first so the nearest can be popped off the end
+
+    def clear(self):
+        self.surfaces.clear()
+        self.used = 0
+        self.unbaked = None
+
+    # Called when a tile in the chunk changes, the chunk is baked again the next time it is rendered
+    def invalidate(self, chunk_loc):
+        surf = self.surfaces.pop(chunk_loc, None)
+        if surf is not None:
+            self.used -= self.size_of(surf)
+
+    def size_of(self, surf):
+        return surf.get_width() * surf.get_height() * surf.get_bytesize()
+
+    def get(self, chunk_loc):
+        surf = self.surfaces.get(chunk_loc)
+        if surf is not None:
+            self.surfaces.move_to_end(chunk_loc)
+            return surf
+        surf = self.bake(chunk_loc)
+        self.surfaces[chunk_loc] = surf
+        self.used += self.size_of(surf)
+        while self.used > self.budget and len(self.surfaces) > 1:   # Never evicting the one just baked
+            self.used -= self.size_of(self.surfaces.popitem(last=False)[1])
+        return surf
+
+    # Bakes as many chunks as fit in the budget, so the first frames of a level don't have to
+    def prebake(self):
+        for chunk_loc in self.tilemap.chunks:
+            if self.used >= self.budget:
+                break
+            self.get(chunk_loc)
+
+    # Bakes a few chunks at a time starting from the ones around "near" (a chunk position), called once a frame so a new level gets baked over its first frames
+    # instead of all at once in the frame it is swapped in, big levels took longer than a frame for that. Chunks that come on screen before their turn are baked by get() anyway
+    def bake_some(self, count, near):
+        if self.unbaked is None:
+            self.unbaked = sorted(self.tilemap.chunks, key=lambda loc: (loc[0] - near[0]) ** 2 + (loc[1] - near[1]) ** 2, reverse=True)
+        while count and self.unbaked and self.used < self.budget:
+            chunk_loc = self.unbaked.pop()
+            if chunk_loc not in self.surfaces and chunk_loc in self.tilemap.chunks:    # Already drawn, or removed in the meantime
+                self.get(chunk_loc)
+                count -= 1
+
+    def bake(self, chunk_loc):
+        tilemap = self.tilemap
+        assets = tilemap.game.assets
+        origin = (chunk_loc[0] * tilemap.chunk_px, chunk_loc[1] * tilemap.chunk_px)
+
+        # Tiles bigger than the grid hang over the right and bottom edges of the chunk, so the surface is grown to fit them
+        tiles = []
+        size = [tilemap.chunk_px, tilemap.chunk_px]
+        for x, y, tile_type, variant in tilemap.chunk_tiles(chunk_loc):
+            if tile_type not in assets:     # Tiles without an image in this game (spawners for example) are not drawn
+                continue
+            img = assets[tile_type][variant]
+            pos = (x * tilemap.tile_size - origin[0], y * tilemap.tile_size - origin[1])
+            tiles.append((img, pos))
+            size[0] = max(size[0], pos[0] + img.get_width())
+            size[1] = max(size[1], pos[1] + img.get_height())
+
+        # The tile images are colorkeyed with black, so the chunk surface can use the same trick to stay transparent
+        surf = pygame.Surface(size)
+        surf.set_colorkey((0, 0, 0))
+        surf.blits(tiles, doreturn=False)
+        return surf
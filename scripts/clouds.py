@@ -1,36 +1,93 @@
 import random
 
-class Cloud:
-    def __init__(self, pos, img, speed, depth):
-        self.pos = list(pos)
-        self.img = img
-        self.speed = speed
-        self.depth = depth
+import pygame
+
+CLOUD_BANDS = 4     # Clouds are grouped into this many layers by their depth
+
+# One layer of the background that scrolls as a whole, like the clouds at one depth or far away mountains
+# Everything on the layer is drawn once on to a surface the size of the screen that wraps around at its edges,
+# so rendering costs the same few blits however many things are on the layer, the surface is only drawn again when things are added or removed
+class ParallaxLayer:
+    def __init__(self, size, depth, speed=0, repeat_y=True):
+        self.size = size
+        self.depth = depth          # How much the layer moves with the camera, 0 is not at all and 1 is as much as the level
+        self.speed = speed          # Drift on the x-axis per step, for the clouds
+        self.repeat_y = repeat_y    # Mountains and such only repeat sideways
+        self.items = []             # (image, position on the layer)
+        self.drift = 0
+
+        # Black is the transparent colour like in the images, RLEACCEL makes the empty parts of the layer fast to skip
+        self.surf = pygame.Surface(size)
+        self.surf.set_colorkey((0, 0, 0), pygame.RLEACCEL)
+        self.dirty = True
+
+    def add(self, img, pos):
+        self.items.append((img, (pos[0] % self.size[0], pos[1] % self.size[1] if self.repeat_y else pos[1])))
+        self.dirty = True
+
+    def clear(self):
+        self.items.clear()
+        self.dirty = True
+
+    # Things over the edges are drawn again on the other side, so the layer can be tiled without seams
+    def build(self):
+        self.surf.fill((0, 0, 0))
+        width, height = self.size
+        for img, pos in self.items:
+            for x in (pos[0], pos[0] - width):
+                for y in ((pos[1], pos[1] - height) if self.repeat_y else (pos[1],)):
+                    self.surf.blit(img, (x, y))
+        self.dirty = False
 
     def update(self):
-        self.pos[0] += self.speed
+        self.drift += self.speed
 
     def render(self, surf, offset=(0, 0)):
-        # Parallax effect done with depth value
-        render_pos = (self.pos[0] - offset[0] * self.depth, self.pos[1] - offset[1] * self.depth)
-        # Yes
-        surf.blit(self.img, ((render_pos[0] % (surf.get_width() + self.img.get_width()) - self.img.get_width()), (render_pos[1] % (surf.get_height() + self.img.get_height()) - self.img.get_height())))
+        if self.dirty:
+            self.build()
+        width, height = self.size
+        # Position of a copy of the layer inside the first tile, more copies are tiled from there on to cover the screen
+        x = (self.drift - offset[0] * self.depth) % width - width
+        if self.repeat_y:
+            y = (-offset[1] * self.depth) % height - height
+        else:
+            y = -offset[1] * self.depth
+        while x < surf.get_width():
+            tile_y = y
+            while tile_y < surf.get_height():
+                surf.blit(self.surf, (x, tile_y))
+                if not self.repeat_y:
+                    break
+                tile_y += height
+            x += width
 
 class Clouds:
-    def __init__(self, cloud_images, count=16):
-        self.clouds = []
+    def __init__(self, cloud_images, size, count=16, rng=None, bands=CLOUD_BANDS):
+        rng = rng or random.Random()
 
-        # Generating some random clouds with random parameters
+        # A layer for each band of depths from 0.2 to 0.8, closer clouds also drift faster
+        self.layers = []
+        for i in range(bands):
+            closeness = (i + 0.5) / bands
+            self.layers.append(ParallaxLayer(size, 0.2 + 0.6 * closeness, speed=0.05 + 0.05 * closeness))
+
+        # Generating some random clouds with random parameters, each goes to the layer closest to its depth
         for i in range(count):
-            self.clouds.append(Cloud((random.random() * 99999, random.random() * 99999), random.choice(cloud_images), random.random() * 0.05 + 0.05, random.random() * 0.6 + 0.2))
-        
-        # Sorts the clouds by depth, so that clouds closer to the camera are rendered on top of the further away ones
-        self.clouds.sort(key=lambda x: x.depth)
+            pos = (rng.random() * 99999, rng.random() * 99999)
+            img = rng.choice(cloud_images)
+            rng.random()    # The speed of the cloud before the layers, still drawn so the rest of the clouds come out the same for a seed
+            depth = rng.random() * 0.6 + 0.2
+            self.layers[min(bands - 1, int((depth - 0.2) / 0.6 * bands))].add(img, pos)
+
+    # More layers, like mountains far behind the clouds, the layers are kept sorted so the closer ones are rendered on top of the further away ones
+    def add_layer(self, layer):
+        self.layers.append(layer)
+        self.layers.sort(key=lambda x: x.depth)
 
     def update(self):
-        for cloud in self.clouds:
-            cloud.update()
+        for layer in self.layers:
+            layer.update()
 
     def render(self, surf, offset=(0, 0)):
-        for cloud in self.clouds:
-            cloud.render(surf, offset=offset)
\ No newline at end of file
+        for layer in self.layers:
+            layer.render(surf, offset=offset)
@@ -0,0 +1,44 @@
+# Broad-phase collision detection for everything that moves, the player, the enemies and the projectiles
+# The bodies are put into a spatial hash that is built again every frame, so a body is only tested against the bodies sharing a cell with it instead of all of them
+class SpatialHash:
+    def __init__(self, cell_size=32):
+        self.cell_size = cell_size
+        self.cells = {}     # Cell position -> list of (layer, body, rect)
+        self.layers = {}    # Layer name -> list of (body, rect), layers are things like 'player', 'enemy' or 'projectile'
+
+    # The lists are emptied instead of thrown away, so building the hash again every frame mostly reuses them
+    # Cells far from everything would pile up as the bodies move around the level, so the cells are dropped once there are many of them
+    def clear(self):
+        if len(self.cells) > 256:
+            self.cells.clear()
+        for cell in self.cells.values():
+            cell.clear()
+        for layer in self.layers.values():
+            layer.clear()
+
+    def insert(self, layer, body, rect):
+        entry = (layer, body, rect)
+        self.layers.setdefault(layer, []).append((body, rect))
+        for x in range(rect.left // self.cell_size, (rect.right - 1) // self.cell_size + 1):
+            for y in range(rect.top // self.cell_size, (rect.bottom - 1) // self.cell_size + 1):
+                self.cells.setdefault((x, y), []).append(entry)
+
+    # Bodies of the layer overlapping the rect, each body only once even if it is in many cells
+    def query(self, rect, layer):
+        found = []
+        seen = set()
+        for x in range(rect.left // self.cell_size, (rect.right - 1) // self.cell_size + 1):
+            for y in range(rect.top // self.cell_size, (rect.bottom - 1) // self.cell_size + 1):
+                for entry in self.cells.get((x, y), ()):
+                    if entry[0] == layer and id(entry[1]) not in seen and entry[2].colliderect(rect):
+                        seen.add(id(entry[1]))     # id() so the bodies don't need to be hashable
+                        found.append(entry[1])
+        return found
+
+    # Every overlapping (body_a, body_b) pair between the two layers
+    def pairs(self, layer_a, layer_b):
+        found = []
+        for body, rect in self.layers.get(layer_a, ()):
+            for other in self.query(rect, layer_b):
+                found.append((body, other))
+        return found
@@ -0,0 +1,25 @@
+import glob
+import os
+import sys
+
+from scripts.tilemap import Tilemap, BINARY_MAP_EXT
+
+# Converts JSON maps into the binary map format, next to the original files
+# Usage: python -m scripts.convert_maps [map.json ...]      (all of data/maps/ if no files are given)
+
+# The tilemap only needs the images for rendering, converting works without them
+class NoAssets:
+    assets = {}
+
+def convert(path, compress=True):
+    tilemap = Tilemap(NoAssets(), cache_budget=0)   # No budget, nothing is baked
+    tilemap.load(path)
+    out_path = os.path.splitext(path)[0] + BINARY_MAP_EXT
+    tilemap.save(out_path, compress=compress)
+    return out_path
+
+if __name__ == '__main__':
+    paths = sys.argv[1:] or sorted(glob.glob('data/maps/*.json'))
+    for path in paths:
+        out_path = convert(path)
+        print(path, os.path.getsize(path), 'bytes ->', out_path, os.path.getsize(out_path), 'bytes')
@@ -0,0 +1,75 @@
+import math
+
+# Movements given to the physics of an enemy, made once instead of a new tuple for every enemy every frame
+STAND = (0, 0)
+WALK_RIGHT = (0.5, 0)
+WALK_LEFT = (-0.5, 0)
+
+# The enemies of a level and their AI, game.enemies is one of these and works like the old list of enemies
+# All the enemies think in one pass: the walking timers are kept in a list next to the enemies and the player's position is read once for all the shooting checks
+# The enemies still act one after another in the same order as before, so the random rolls and the shots come out the same for a seed
+class EnemyAI:
+    def __init__(self, game):
+        self.game = game
+        self.enemies = []   # In the order they were added, which is the order they act in
+        self.walking = []   # Steps left to walk for every enemy, 0 when standing
+
+    def __iter__(self):
+        return iter(self.enemies)
+
+    def __len__(self):
+        return len(self.enemies)
+
+    def __getitem__(self, i):
+        return self.enemies[i]
+
+    def append(self, enemy):
+        self.enemies.append(enemy)
+        self.walking.append(0)
+
+    def remove(self, enemy):
+        i = self.enemies.index(enemy)
+        del self.enemies[i]
+        del self.walking[i]
+
+    def update(self, tilemap, player):
+        rng = self.game.rng.ai
+        player_x, player_y = player.pos
+        walking = self.walking
+
+        for i, enemy in enumerate(self.enemies):
+            movement = STAND
+            timer = walking[i]
+            if timer:
+                pos = enemy.pos
+                flip = enemy.flip
+                # Checking seven pixels ahead and 23 below for solid ground, int() drops the decimals like rect() does
+                if tilemap.solid_check((int(pos[0]) + enemy.size[0] // 2 + (-7 if flip else 7), pos[1] + 23)):
+                    if enemy.collisions['right'] or enemy.collisions['left']:   # If running into something on right or left
+                        flip = enemy.flip = not flip
+                    else:
+                        movement = WALK_LEFT if flip else WALK_RIGHT
+                else:
+                    flip = enemy.flip = not flip    # No solid ground found ahead, flip the entity
+                walking[i] = timer - 1
+                # Shooting script, note that this is one frame window after the enemy has stopped walking
+                # The player has to be in front of the enemy, abs() around the height comparison in the old code let the player be at any height above
+                if timer == 1 and player_y - pos[1] < 16 and (player_x - pos[0] < 0 if flip else player_x - pos[0] > 0):
+                    self.shoot(enemy)
+            elif rng.random() < 0.01:     # 1% chance of happening per frame -> game running at 60 fps means around every 1.6s
+                walking[i] = rng.randint(30, 120)   # How long to walk for
+
+            enemy.update(tilemap, movement)
+
+    def shoot(self, enemy):
+        effects = self.game.rng.effects
+        self.game.sfx['shoot'].play()
+        if enemy.flip:
+            projectile = self.game.projectiles.acquire((enemy.rect().centerx - 7, enemy.rect().centery), -1.5)
+            for i in range(4):
+                # Location of the new projectile given as the initial location, also some randomization added to angle and speed
+                self.game.sparks.spawn(projectile.pos, effects.random() - 0.5 + math.pi, 2 + effects.random())
+        else:
+            projectile = self.game.projectiles.acquire((enemy.rect().centerx + 7, enemy.rect().centery), 1.5)
+            for i in range(4):
+                self.game.sparks.spawn(projectile.pos, effects.random() - 0.5, 2 + effects.random())
@@ -1,19 +1,22 @@
 import math
-import random
 
 import pygame
 
-from scripts.particle import Particle
-from scripts.spark import Spark
+from scripts.utils import flip_image
 
+# The entities use __slots__ to keep them small and their attributes fast to reach, subclasses add their own attributes to __slots__
 class PhysicsEntity:
+    __slots__ = ('game', 'type', 'pos', 'prev_pos', 'size', 'velocity', 'collisions', 'hitbox', 'action', 'animation', 'anim_offset', 'flip', 'last_movement')
+
     def __init__(self, game, e_type, pos, size):
         self.game = game
         self.type = e_type
         self.pos = list(pos)    # Didn't quite understand this but helps with handling multiple entities in same position and dealing with tuplets
+        self.prev_pos = list(pos)   # Position before the last simulation step, rendering blends between the two
         self.size = size
         self.velocity = [0, 0]
         self.collisions = {'up': False, 'down': False, 'right': False, 'left': False}
+        self.hitbox = pygame.Rect(0, 0, size[0], size[1])   # Rect reused by the collision checks in update()
 
         self.action = ''
         self.anim_offset = (-3, -3)   # Not all images in animation are the same size of the base image, this will counter act the difference in size
@@ -24,14 +27,25 @@ class PhysicsEntity:
 
     def rect(self):
         return pygame.Rect(self.pos[0], self.pos[1], self.size[0], self.size[1])
+
+    # Moves the entity without it sliding there from its old position on the next rendered frame
+    def teleport(self, pos):
+        self.pos = list(pos)
+        self.prev_pos = list(pos)
+
+    # Position to render at, "alpha" is how far the time is between the last two simulation steps
+    def render_pos(self, alpha=1.0):
+        return (self.prev_pos[0] + (self.pos[0] - self.prev_pos[0]) * alpha, self.prev_pos[1] + (self.pos[1] - self.prev_pos[1]) * alpha)
     
     def set_action(self, action):
         if action != self.action:   # No resetting the current action, let the animation run
             self.action = action
-            self.animation = self.game.assets[self.type + '/' + self.action].copy()
+            self.animation = self.game.assets[self.type + '/' + self.action].play()    # The animation itself is shared, only the starting tick is new
 
     def update(self, tilemap, movement=(0, 0)):
-        self.collisions = {'up': False, 'down': False, 'right': False, 'left': False}   # Reset at every update
+        collisions = self.collisions    # Reset at every update, the same dictionary is reused
+        collisions['up'] = collisions['down'] = collisions['right'] = collisions['left'] = False
+        self.prev_pos[0], self.prev_pos[1] = self.pos
 
         # Can handle gravity aswell with velocity involved in the movement calculations
         frame_movement = (movement[0] + self.velocity[0], movement[1] + self.velocity[1])
@@ -39,7 +53,9 @@ class PhysicsEntity:
         # Movement and associated physics
         # You want to keep the movement axis calculations separate
         self.pos[0] += frame_movement[0]    # X movement
-        entity_rect = self.rect()
+        entity_rect = self.hitbox
+        entity_rect.x = self.pos[0]
+        entity_rect.y = self.pos[1]
         for rect in tilemap.physics_rects_around(self.pos):
             if entity_rect.colliderect(rect):   # Pushes the entity's rectangular to the collisions edge
                 if frame_movement[0] > 0:
@@ -51,7 +67,8 @@ class PhysicsEntity:
                 self.pos[0] = entity_rect.x     # Move the entity to it's rectangular, rects can't handle decimals and so can't do subpixel movement meaning they are not good for entitys general position as you'd only be able to move whole pixel widths.
 
         self.pos[1] += frame_movement[1]    # Y movement
-        entity_rect = self.rect()
+        entity_rect.x = self.pos[0]
+        entity_rect.y = self.pos[1]
         for rect in tilemap.physics_rects_around(self.pos):
             if entity_rect.colliderect(rect):
                 if frame_movement[1] > 0:
@@ -78,45 +95,23 @@ class PhysicsEntity:
         if self.collisions['down'] or self.collisions['up']:
             self.velocity[1] = 0
 
-        self.animation.update()
-
-    # "offset" is for the camera
-    def render(self, surf, offset=(0, 0)):
-        surf.blit(pygame.transform.flip(self.animation.img(), self.flip, False), (self.pos[0] - offset[0] + self.anim_offset[0], self.pos[1] - offset[1] + self.anim_offset[1]))
+    # "offset" is for the camera, "outline" gets the images drawn for their outlines (see outline.py)
+    def render(self, surf, offset=(0, 0), alpha=1.0, outline=None):
+        pos = self.render_pos(alpha)
+        img = self.animation.img(flip=self.flip)
+        img_pos = (pos[0] - offset[0] + self.anim_offset[0], pos[1] - offset[1] + self.anim_offset[1])
+        surf.blit(img, img_pos)
+        if outline:
+            outline.add(img, img_pos)
 
 class Enemy(PhysicsEntity):
+    __slots__ = ()
+
     def __init__(self, game, pos, size):
         super().__init__(game, 'enemy', pos, size)
 
-        self.walking = 0
-
+    # The walking and shooting of all the enemies is decided together in enemy_ai.py, which then moves each enemy with this
     def update(self, tilemap, movement=(0, 0)):
-        if self.walking:
-            if tilemap.solid_check((self.rect().centerx + (-7 if self.flip else 7), self.pos[1] + 23)):   # Checking seven pixels ahead and 23 below for solid ground
-                if (self.collisions['right'] or self.collisions['left']):   # If running into something on right or left
-                    self.flip = not self.flip
-                else:
-                    movement = (movement[0] - 0.5 if self.flip else 0.5, movement[1])
-            else:
-                self.flip = not self.flip       # No solid ground found ahead, flip the entity
-            self.walking = max(0, self.walking - 1)     # Reduing the walk timer
-            if not self.walking:    # Shooting script, note that this is one frame window for this branch after the enemy has stopped walking
-                dis = (self.game.player.pos[0] - self.pos[0], self.game.player.pos[1] - self.pos[1])
-                if (abs(dis[1] < 16)):
-                    if (self.flip and dis[0] < 0):  # If looking to left and player is to the left
-                        self.game.sfx['shoot'].play()
-                        self.game.projectiles.append([[self.rect().centerx - 7 , self.rect().centery], -1.5, 0])
-                        for i in range(4):
-                            # Location of the last projectile, -1 meaning one from the end, given as the initial location, also some randomization added to angle and speed
-                            self.game.sparks.append(Spark(self.game.projectiles[-1][0], random.random() - 0.5 + math.pi, 2 + random.random()))
-                    if (not self.flip and dis[0] > 0):
-                        self.game.sfx['shoot'].play()
-                        self.game.projectiles.append([[self.rect().centerx + 7 , self.rect().centery], 1.5, 0])
-                        for i in range(4):
-                            self.game.sparks.append(Spark(self.game.projectiles[-1][0], random.random() - 0.5, 2 + random.random()))
-        elif random.random() < 0.01:                    # 1% chance of happening per frame -> game running at 60 fps means around every 1.6s
-            self.walking = random.randint(30, 120)      # How long to walk for
-
         super().update(tilemap, movement=movement)
 
         if movement[0] != 0:
@@ -124,32 +119,39 @@ class Enemy(PhysicsEntity):
         else:
             self.set_action('idle')
 
-        # Enemy hit while player is dashing
-        if abs(self.game.player.dashing) >= 50:
-            if self.rect().colliderect(self.game.player.rect()):
-                self.game.screenshake = max(16, self.game.screenshake)
-                self.game.sfx['hit'].play()
-                for i in range(30):     # Sparks and particles on player hit
-                            angle = random.random() * math.pi * 2   # Random angle in a circle
-                            speed = random.random() * 5
-                            self.game.sparks.append(Spark(self.rect().center, angle, 2 + random.random()))
-                            self.game.particles.append(Particle(self.game, 'particle', self.rect().center, velocity=[math.cos(angle + math.pi) * speed * 0.5, math.sin(angle + math.pi) * speed * 0.5], frame=random.randint(0, 7)))
-                self.game.sparks.append(Spark(self.rect().center, 0, 5 + random.random()))
-                self.game.sparks.append(Spark(self.rect().center, math.pi, 5 + random.random()))
-                return True
+    # Enemy hit while player is dashing, the game finds the hits with the broad-phase collisions and removes the enemy afterwards
+    def hit(self):
+        self.game.screenshake = max(16, self.game.screenshake)
+        self.game.sfx['hit'].play()
+        for i in range(30):     # Sparks and particles on player hit
+                    angle = self.game.rng.effects.random() * math.pi * 2   # Random angle in a circle
+                    speed = self.game.rng.effects.random() * 5
+                    self.game.sparks.spawn(self.rect().center, angle, 2 + self.game.rng.effects.random())
+                    self.game.particles.spawn('particle', self.rect().center, velocity=(math.cos(angle + math.pi) * speed * 0.5, math.sin(angle + math.pi) * speed * 0.5), frame=self.game.rng.effects.randint(0, 7))
+        self.game.sparks.spawn(self.rect().center, 0, 5 + self.game.rng.effects.random())
+        self.game.sparks.spawn(self.rect().center, math.pi, 5 + self.game.rng.effects.random())
 
     # Used to render the weapon on top of the entity 
-    def render(self, surf, offset=(0, 0)):
-        super().render(surf, offset=offset)
+    def render(self, surf, offset=(0, 0), alpha=1.0, outline=None):
+        super().render(surf, offset=offset, alpha=alpha, outline=outline)
 
+        pos = self.render_pos(alpha)
+        rect = pygame.Rect(pos[0], pos[1], self.size[0], self.size[1])
         if self.flip:
-            surf.blit(pygame.transform.flip(self.game.assets['gun'], True, False), (self.rect().centerx - 4 - self.game.assets['gun'].get_width() - offset[0], self.rect().centery - offset[1]))   # Flips the gun and offsets it to fit the enemy better
+            img = flip_image(self.game.assets['gun'])
+            img_pos = (rect.centerx - 4 - self.game.assets['gun'].get_width() - offset[0], rect.centery - offset[1])   # Flips the gun and offsets it to fit the enemy better
         else:
-            surf.blit(self.game.assets['gun'], (self.rect().centerx + 4 - offset[0], self.rect().centery - offset[1]))
+            img = self.game.assets['gun']
+            img_pos = (rect.centerx + 4 - offset[0], rect.centery - offset[1])
+        surf.blit(img, img_pos)
+        if outline:
+            outline.add(img, img_pos)
 
 
 # Player entity inheriting much of the general entity's functionality
 class Player(PhysicsEntity):
+    __slots__ = ('air_time', 'jumps', 'wall_slide', 'dashing')
+
     def __init__(self, game, pos, size):
         super().__init__(game, 'player', pos, size)
         self.air_time = 0
@@ -197,10 +199,10 @@ class Player(PhysicsEntity):
         # Controlling the dashing
         if abs(self.dashing) in {60, 50}:   # For spawning some particles from player position when dashing starts OR ends
             for i in range(20):
-                angle = random.random() * math.pi * 2
-                speed = random.random() * 0.5 + 0.5
+                angle = self.game.rng.effects.random() * math.pi * 2
+                speed = self.game.rng.effects.random() * 0.5 + 0.5
                 pvelocity = [math.cos(angle) * speed, math.sin(angle) * speed]  # MATHEMATICAL! This makes the diagonal vectors same lenght as the horizontal and vertical ones
-                self.game.particles.append(Particle(self.game, 'particle', self.rect().center, velocity=pvelocity, frame=random.randint(0, 7)))
+                self.game.particles.spawn('particle', self.rect().center, velocity=pvelocity, frame=self.game.rng.effects.randint(0, 7))
         if self.dashing > 0:
             self.dashing = max(0, self.dashing - 1)
         if self.dashing < 0:
@@ -210,8 +212,8 @@ class Player(PhysicsEntity):
             if abs(self.dashing) == 51:
                 self.velocity[0] *= 0.1     # After the first 10 frames of dash player is brought to stop, rest 50 frames are the cooldown for dash
                 # Spawning some particles as player is dashing
-            pvelocity = [abs(self.dashing) / self.dashing * random.random() * 3, 0]
-            self.game.particles.append(Particle(self.game, 'particle', self.rect().center, velocity=pvelocity, frame=random.randint(0, 7)))
+            pvelocity = [abs(self.dashing) / self.dashing * self.game.rng.effects.random() * 3, 0]
+            self.game.particles.spawn('particle', self.rect().center, velocity=pvelocity, frame=self.game.rng.effects.randint(0, 7))
 
         # Brings the player to halt if moving automagically horizontally
         if self.velocity[0] > 0:
@@ -219,9 +221,9 @@ class Player(PhysicsEntity):
         else:
             self.velocity[0] = min(self.velocity[0] + 0.1, 0)
 
-    def render(self, surf, offset=(0, 0)):
+    def render(self, surf, offset=(0, 0), alpha=1.0, outline=None):
         if abs(self.dashing) <= 50:     # Overriding the entity rendering if dashing
-            super().render(surf, offset=offset)
+            super().render(surf, offset=offset, alpha=alpha, outline=outline)
 
     def jump(self):
         if self.wall_slide:
@@ -0,0 +1,27 @@
+import random
+
+# Scripted input for running the game without a player, see Game.simulate in game.py
+# A script is any iterable of (movement, actions) entries, one per simulation step:
+#   movement is (left, right), the arrow keys held down on that step
+#   actions are the jumps and dashes pressed on that step, for example ('jump',) or ('jump', 'dash')
+
+# Random button mashing for soak testing, keys are held for a while like a player would instead of changing every step
+def random_script(steps, rng=None, press_chance=0.02, action_chance=0.03):
+    rng = rng or random.Random()
+    movement = [False, False]
+    for step in range(steps):
+        if rng.random() < press_chance:
+            movement[0] = not movement[0]
+        if rng.random() < press_chance:
+            movement[1] = not movement[1]
+        actions = []
+        if rng.random() < action_chance:
+            actions.append('jump')
+        if rng.random() < action_chance:
+            actions.append('dash')
+        yield tuple(movement), actions
+
+# Holds the same keys for the given number of steps, scripts can be built by chaining these
+def hold(steps, left=False, right=False, actions=()):
+    for step in range(steps):
+        yield (left, right), actions if step == 0 else ()
@@ -0,0 +1,88 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pygame
+
+from scripts.convert_maps import NoAssets
+from scripts.tilemap import Tilemap, BINARY_MAP_EXT
+
+MAP_DIR = 'data/maps/'
+
+# A level can be saved as JSON or in the binary format, if both exist the one changed last is used
+# so that a level edited as JSON after converting it is not played from the old binary file
+def level_path(map_id):
+    binary_path = MAP_DIR + str(map_id) + BINARY_MAP_EXT
+    json_path = MAP_DIR + str(map_id) + '.json'
+    if not os.path.exists(binary_path):
+        return json_path
+    if os.path.exists(json_path) and os.path.getmtime(json_path) > os.path.getmtime(binary_path):
+        return json_path
+    return binary_path
+
+# Ids of the levels in the maps folder, the files named with just a number and '.json' or BINARY_MAP_EXT, so other files there (backups and such) are left alone
+def map_ids():
+    ids = set()     # Same level in both formats counts once
+    for name in os.listdir(MAP_DIR):
+        stem, ext = os.path.splitext(name)
+        if ext in ('.json', BINARY_MAP_EXT) and stem.isascii() and stem.isdigit():
+            ids.add(int(stem))
+    return sorted(ids)
+
+# Everything the game needs from a map file, ready to be swapped in
+class Level:
+    def __init__(self, tilemap, leaf_spawners, spawners):
+        self.tilemap = tilemap
+        self.leaf_spawners = leaf_spawners
+        self.spawners = spawners
+
+# Run in the parser process, turns a JSON map in to the binary format that can be read in quickly
+# Parsing JSON holds the GIL the whole time, in the loader thread that froze the game for as long on big maps
+def binary_map(path):
+    tilemap = Tilemap(NoAssets(), cache_budget=0)
+    tilemap.load(path, prebake=False)
+    return tilemap.to_binary(compress=False)
+
+# Parsing the map and the preprocessing of it, safe to run outside the main thread as it only makes new objects
+# The chunks are not baked here, that blits the tile images the main thread is drawing with at the same time, the game bakes them a few at a time as it renders
+def prepare_level(game, map_id, parser=None):
+    tilemap = Tilemap(game, tile_size=16)
+    path = level_path(map_id)
+    if parser is not None and not path.endswith(BINARY_MAP_EXT):
+        tilemap.load_bytes(parser.submit(binary_map, path).result(), prebake=False)
+    else:
+        tilemap.load(path, prebake=False)
+
+    leaf_spawners = []
+    for tree in tilemap.extract([('large_decor', 2)], keep=True):
+        leaf_spawners.append(pygame.Rect(4 + tree['pos'][0], 4 + tree['pos'][1], 23, 13))  # Rectangle here in this size makes sense for the tree tile
+
+    spawners = tilemap.extract([('spawners', 0), ('spawners', 1)])
+    return Level(tilemap, leaf_spawners, spawners)
+
+# Loads levels in a background thread, so the next level can be prepared while the transition is playing instead of freezing the game when it is needed
+class LevelLoader:
+    def __init__(self, game):
+        self.game = game
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        # JSON maps are parsed in a process of their own, started right away so it is ready by the first transition
+        # Not in headless mode, the stalls don't matter there and the batch runner already runs games in processes that can't have their own
+        self.parser = None
+        if not game.headless:
+            os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')   # The parser process imports pygame again, no need for the greeting twice
+            self.parser = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+            self.parser.submit(int)
+        self.pending = {}   # Map id -> future of the Level
+        self.level_count = len(map_ids())
+
+    # Starts loading the level in the background, nothing happens if it is already on the way
+    def prefetch(self, map_id):
+        if map_id not in self.pending:
+            self.pending[map_id] = self.executor.submit(prepare_level, self.game, map_id, self.parser)
+
+    # The level, waiting for the background load if it is not done yet, or loading it right here if it was never prefetched
+    def get(self, map_id):
+        future = self.pending.pop(map_id, None)
+        if future is None:
+            return prepare_level(self.game, map_id)
+        return future.result()
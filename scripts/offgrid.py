@@ -0,0 +1,73 @@
+import math
+
+import pygame
+
+# Spatial index for the offgrid tiles, the tiles are sorted into a uniform grid of buckets so only the buckets under the camera or the mouse need to be looked at
+# Every tile gets a serial number when added, the tiles are kept in that order as it is also the order they are rendered in
+class OffgridIndex:
+    def __init__(self, size_of, bucket_size=64):
+        self.size_of = size_of          # Function giving the (width, height) of a tile, the index doesn't know about images
+        self.bucket_size = bucket_size  # In pixels
+        self.tiles = {}                 # Serial -> tile, dictionaries remember the insertion order
+        self.rects = {}                 # Serial -> area the tile covers
+        self.buckets = {}               # Bucket position -> serials of the tiles overlapping the bucket
+        self.next_serial = 0
+
+    def __iter__(self):
+        return iter(self.tiles.values())
+
+    def __len__(self):
+        return len(self.tiles)
+
+    def clear(self):
+        self.tiles.clear()
+        self.rects.clear()
+        self.buckets.clear()
+
+    # Bucket positions covered by the rect, big tiles can be in several buckets
+    def bucket_range(self, rect):
+        return (range(rect.left // self.bucket_size, (rect.right - 1) // self.bucket_size + 1),
+                range(rect.top // self.bucket_size, (rect.bottom - 1) // self.bucket_size + 1))
+
+    def add(self, tile):
+        serial = self.next_serial
+        self.next_serial += 1
+        size = self.size_of(tile)
+        # Decimal positions are floored and the size grown by one so the rect always covers the drawn image
+        rect = pygame.Rect(math.floor(tile['pos'][0]), math.floor(tile['pos'][1]), size[0] + 1, size[1] + 1)
+        self.tiles[serial] = tile
+        self.rects[serial] = rect
+        x_range, y_range = self.bucket_range(rect)
+        for bx in x_range:
+            for by in y_range:
+                self.buckets.setdefault((bx, by), []).append(serial)
+        return serial
+
+    def remove(self, serial):
+        del self.tiles[serial]
+        x_range, y_range = self.bucket_range(self.rects.pop(serial))
+        for bx in x_range:
+            for by in y_range:
+                bucket = self.buckets[(bx, by)]
+                bucket.remove(serial)
+                if not bucket:
+                    del self.buckets[(bx, by)]
+
+    # Serials of the tiles overlapping the rect, in render order
+    def query_rect(self, rect):
+        found = set()
+        x_range, y_range = self.bucket_range(rect)
+        for bx in x_range:
+            for by in y_range:
+                if (bx, by) in self.buckets:
+                    for serial in self.buckets[(bx, by)]:
+                        if self.rects[serial].colliderect(rect):
+                            found.add(serial)
+        return sorted(found)
+
+    # Serials of the tiles under the point, used by the editor for deleting
+    def query_point(self, pos):
+        bucket_loc = (int(pos[0] // self.bucket_size), int(pos[1] // self.bucket_size))
+        if bucket_loc not in self.buckets:
+            return []
+        return [serial for serial in self.buckets[bucket_loc] if self.rects[serial].collidepoint(pos)]
@@ -0,0 +1,68 @@
+import weakref
+
+import pygame
+
+OUTLINE_COLOR = (0, 0, 0, 180)
+OUTLINE_OFFSETS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+
+# Outlines for everything rendered on to the display, drawn on to display_2 below it
+# 'sprite': everything drawn on the display also hands its image to the outliner with add(), the silhouette of every image is made once and remembered
+#           (every animation frame and its flipped copy, the baked tilemap chunks...), so a frame only blits ready silhouettes together instead of reading the whole display back
+# 'mask':   the original pygame.mask way, the silhouette is made from the finished display every frame
+# Both end up with exactly the same silhouette, F2 in the game switches between the two for comparing
+class Outliner:
+    MODES = ['sprite', 'mask']
+
+    def __init__(self, size, mode='sprite'):
+        self.size = size
+        self.mode = mode
+        self.layer = pygame.Surface(size, pygame.SRCALPHA)     # The silhouette of the whole display, reused between frames
+        self.silhouettes = weakref.WeakKeyDictionary()          # Image -> its silhouette, forgotten together with the image (baked chunks come and go)
+        self.queue = []     # Silhouettes of the images drawn this frame, in the form Surface.blits takes them
+        self.polygons = []  # Polygons drawn this frame, the sparks
+
+    def toggle(self):
+        self.mode = self.MODES[(self.MODES.index(self.mode) + 1) % len(self.MODES)]
+
+    # What the render functions hand their images to, None in the mask mode as it doesn't need them
+    def recorder(self):
+        return self if self.mode == 'sprite' else None
+
+    # Same rule as pygame.mask.from_surface on the display, the colorkeyed parts of the image are left out
+    def silhouette(self, img):
+        silhouette = self.silhouettes.get(img)
+        if silhouette is None:
+            silhouette = pygame.mask.from_surface(img).to_surface(setcolor=OUTLINE_COLOR, unsetcolor=(0, 0, 0, 0))
+            self.silhouettes[img] = silhouette
+        return silhouette
+
+    # Called for every image blitted on to the display, with the same position
+    def add(self, img, pos):
+        # Blending with max joins the silhouettes together the way one mask of the display would, overlapping ones don't get darker
+        self.queue.append((self.silhouette(img), pos, None, pygame.BLEND_RGBA_MAX))
+
+    def add_polygon(self, points):
+        self.polygons.append(points)
+
+    def render(self, src, dst):
+        if self.mode == 'mask':
+            self.render_mask(src, dst)
+        else:
+            self.render_sprite(dst)
+
+    def render_mask(self, src, dst):
+        # Mask from the dipslay with everything that needs the outline
+        display_mask = pygame.mask.from_surface(src)
+        display_mask.to_surface(self.layer, setcolor=OUTLINE_COLOR, unsetcolor=(0, 0, 0, 0))
+        for offset in OUTLINE_OFFSETS:   # Basicly rendering four dropshadows for everything
+            dst.blit(self.layer, offset)
+
+    def render_sprite(self, dst):
+        self.layer.fill((0, 0, 0, 0))
+        self.layer.blits(self.queue, doreturn=False)
+        for points in self.polygons:
+            pygame.draw.polygon(self.layer, OUTLINE_COLOR, points)
+        self.queue.clear()
+        self.polygons.clear()
+        for offset in OUTLINE_OFFSETS:
+            dst.blit(self.layer, offset)
@@ -1,24 +1,124 @@
-class Particle:
-    def __init__(self, game, p_type, pos, velocity=[0, 0], frame=0):
+import numpy as np
+
+# Extra movement for some particle types, applied to all particles of the type at once
+# Leaves get a sine curve path as they fall
+def leaf_drift(pos, frame):
+    pos[:, 0] += np.sin(frame * 0.035) * 0.3
+
+PARTICLE_BEHAVIORS = {
+    'leaf': leaf_drift,
+}
+
+# All the particles live in preallocated NumPy arrays, one array per property instead of one object per particle
+# That way moving, animating and removing particles is done for all of them at once
+class ParticleSystem:
+    def __init__(self, game, capacity=1024):
         self.game = game
-        self.type = p_type
-        self.pos = list(pos)
-        self.velocity = list(velocity)
-        self.animation = self.game.assets['particle/' + p_type ].copy()
-        self.animation.frame = frame
+        self.count = 0      # Particles alive, they are always packed at the start of the arrays
+
+        self.pos = np.zeros((capacity, 2))
+        self.velocity = np.zeros((capacity, 2))
+        self.frame = np.zeros(capacity, dtype=np.int32)     # Animation frame of every particle
+        self.type = np.zeros(capacity, dtype=np.int32)
+        self.dying = np.zeros(capacity, dtype=bool)         # Animation played out, removed on the next update
+
+        # Per type animation data, looked up with the type ids
+        self.types = []
+        self.type_ids = {}
+        self.images = []                                    # Every image of every type in one flat list
+        self.half_sizes = np.zeros((0, 2))                  # Centering offsets of the images in self.images
+        self.frame_images = np.zeros(0, dtype=np.int32)     # Index in self.images of every animation step of every type, from the animation's frame table
+        self.first_frames = np.zeros(0, dtype=np.int32)     # Index of the type's first step in self.frame_images
+        self.last_frames = np.zeros(0, dtype=np.int32)
+        self.loops = np.zeros(0, dtype=bool)
+
+    # Taking the animation of the type from the game assets the first time the type is spawned
+    def type_id(self, p_type):
+        if p_type not in self.type_ids:
+            animation = self.game.assets['particle/' + p_type]
+            self.type_ids[p_type] = len(self.types)
+            self.types.append(p_type)
+            self.first_frames = np.append(self.first_frames, np.int32(len(self.frame_images)))
+            self.frame_images = np.append(self.frame_images, np.array(animation.frame_indices, dtype=np.int32) + len(self.images))
+            self.images += animation.images
+            # Centering offsets are worked out once per image instead of every frame
+            self.half_sizes = np.append(self.half_sizes, [(img.get_width() // 2, img.get_height() // 2) for img in animation.images], axis=0)
+            self.last_frames = np.append(self.last_frames, np.int32(animation.length - 1))
+            self.loops = np.append(self.loops, animation.loop)
+        return self.type_ids[p_type]
+
+    def clear(self):
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    # Doubling the arrays if they are full, so spawning stays cheap on average
+    def grow(self):
+        capacity = len(self.frame) * 2
+        for name in ['pos', 'velocity', 'frame', 'type', 'dying']:
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def spawn(self, p_type, pos, velocity=(0, 0), frame=0):
+        if self.count == len(self.frame):
+            self.grow()
+        i = self.count
+        self.pos[i] = pos
+        self.velocity[i] = velocity
+        self.frame[i] = frame
+        self.type[i] = self.type_id(p_type)
+        self.dying[i] = False
+        self.count += 1
 
     def update(self):
-        kill = False    
-        if self.animation.done:     # For removing the particle once it's animation is done
-            kill = True
+        self.remove_dying()
+        n = self.count
+        frame = self.frame[:n]
+        ptype = self.type[:n]
+
+        # Particles with their animation done are rendered once more and removed on the next update
+        last_frame = self.last_frames[ptype]
+        loop = self.loops[ptype]
+        self.dying[:n] = ~loop & (frame >= last_frame)
+
+        self.pos[:n] += self.velocity[:n]
+
+        # Moving the frame by one, looping animations wrap around and the rest stop at their last frame
+        frame += 1
+        np.putmask(frame, loop, frame % (last_frame + 1))
+        np.minimum(frame, last_frame, out=frame)
 
-        self.pos[0] += self.velocity[0]
-        self.pos[1] += self.velocity[1]
+        for p_type, behavior in PARTICLE_BEHAVIORS.items():
+            if p_type in self.type_ids:
+                of_type = ptype == self.type_ids[p_type]
+                if of_type.any():
+                    pos = self.pos[:n][of_type]
+                    behavior(pos, frame[of_type])
+                    self.pos[:n][of_type] = pos
 
-        self.animation.update()
+    # Swap-remove, the holes left by the removed particles are filled with the live particles from the end of the arrays
+    def remove_dying(self):
+        n = self.count
+        dead = np.flatnonzero(self.dying[:n])
+        if not len(dead):
+            return
+        new_count = n - len(dead)
+        holes = dead[dead < new_count]
+        movers = np.flatnonzero(~self.dying[new_count:n]) + new_count
+        for arr in (self.pos, self.velocity, self.frame, self.type, self.dying):
+            arr[holes] = arr[movers]
+        self.count = new_count
 
-        return kill
-    
     def render(self, surf, offset=(0, 0)):
-        img = self.animation.img()
-        surf.blit(img, (self.pos[0] - offset[0] - img.get_width() // 2, self.pos[1] - offset[1] - img.get_height() // 2))   # Centering for easier control on behaviour
\ No newline at end of file
+        n = self.count
+        ptype = self.type[:n]
+        img_index = self.frame_images[self.first_frames[ptype] + self.frame[:n]]
+        # Centering for easier control on behaviour
+        render_pos = self.pos[:n] - offset - self.half_sizes[img_index]
+        # Only the particles on the screen are handed to pygame, all of them are drawn with one blits() call
+        visible = (render_pos[:, 0] > -16) & (render_pos[:, 0] < surf.get_width()) & (render_pos[:, 1] > -16) & (render_pos[:, 1] < surf.get_height())
+        imgs = map(self.images.__getitem__, img_index[visible].tolist())
+        surf.blits(zip(imgs, render_pos[visible].tolist()), doreturn=False)
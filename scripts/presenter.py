@@ -0,0 +1,140 @@
+import math
+
+import numpy as np
+import pygame
+
+# How the small game frame is fitted on to the window
+#   stretch: fills the whole window, the picture is stretched if the window has a different shape
+#   fit:     as big as fits while keeping the shape, black bars on the sides
+#   integer: the biggest whole number scale that fits, every game pixel is the same size on the window
+SCALE_MODES = ['stretch', 'fit', 'integer']
+DIRTY_BLOCK = 16    # Size of the blocks the frame is compared in, in game pixels
+
+# Puts the finished game frame on to the window
+# The scaled frame is drawn into a surface made once instead of a new one every frame
+# While the camera stands still only the blocks of the frame that changed since the last frame are scaled and sent to the window
+class Presenter:
+    def __init__(self, frame_size, mode='fit', block=DIRTY_BLOCK):
+        self.frame_size = frame_size
+        self.mode = mode
+        self.block = block if frame_size[0] % block == 0 and frame_size[1] % block == 0 else 0     # 0 turns the dirty blocks off
+
+        # Copy of the last frame for finding the changed blocks, indexed [x][y] like pygame.surfarray
+        self.previous = np.zeros(frame_size, dtype=np.uint32)
+        self.changed = np.zeros(frame_size, dtype=bool)
+        self.previous_valid = False     # Whether the window shows exactly self.previous
+        self.last_camera = None
+
+        self.scaled = None          # Frame scaled to the window, made again when the window size changes
+        self.update_rects = None    # Window areas to update on flip(), None for the whole window
+        self.resize()
+
+    # Works out where the frame goes on the window, called again whenever the window size or the mode changes
+    def resize(self):
+        self.screen = pygame.display.get_surface()
+        screen_w, screen_h = self.screen.get_size()
+        frame_w, frame_h = self.frame_size
+        if self.mode == 'stretch':
+            size = (screen_w, screen_h)
+        elif self.mode == 'fit':
+            scale = min(screen_w / frame_w, screen_h / frame_h)
+            size = (max(1, int(frame_w * scale)), max(1, int(frame_h * scale)))
+        else:
+            scale = max(1, min(screen_w // frame_w, screen_h // frame_h))
+            size = (frame_w * scale, frame_h * scale)
+        self.dest = pygame.Rect((screen_w - size[0]) // 2, (screen_h - size[1]) // 2, size[0], size[1])
+        self.scale = (size[0] / frame_w, size[1] / frame_h)
+
+        # A whole number scale lets the changed blocks be scaled on their own straight on to the window, they line up exactly with the fully scaled frame
+        self.integer_scale = int(self.scale[0]) if self.scale[0] == self.scale[1] == int(self.scale[0]) else 0
+
+        # The window outside the frame, filled with black
+        self.bars = [rect for rect in [pygame.Rect(0, 0, screen_w, self.dest.top), pygame.Rect(0, self.dest.bottom, screen_w, screen_h - self.dest.bottom),
+                                       pygame.Rect(0, self.dest.top, self.dest.left, self.dest.height), pygame.Rect(self.dest.right, self.dest.top, screen_w - self.dest.right, self.dest.height)] if rect.width > 0 and rect.height > 0]
+        self.scaled = None
+        self.invalidate()
+
+    def set_mode(self, mode):
+        self.mode = mode
+        self.resize()
+
+    # Makes the next frame go to the window in full, for example after something else has been drawn on the window
+    def invalidate(self):
+        self.previous_valid = False
+
+    # Window position to frame position, for the mouse
+    def to_frame(self, pos):
+        return ((pos[0] - self.dest.x) / self.scale[0], (pos[1] - self.dest.y) / self.scale[1])
+
+    # "offset" moves the frame on the window (screenshake), "camera" is the camera position the frame was drawn with
+    def present(self, frame, offset=(0, 0), camera=None):
+        trackable = self.block and frame.get_bytesize() == 4
+        shaking = offset[0] or offset[1]
+        if trackable and self.previous_valid and not shaking and camera is not None and camera == self.last_camera:
+            self.present_changes(frame)
+        else:
+            self.present_full(frame, offset)
+            if trackable:
+                pixels = pygame.surfarray.pixels2d(frame)
+                np.copyto(self.previous, pixels)
+                del pixels  # Unlocks the surface
+            self.previous_valid = trackable and not shaking     # A shaken frame is not where the blocks would be drawn
+        self.last_camera = camera
+
+    def scale_frame(self, frame):
+        if self.scaled is None or self.scaled.get_size() != self.dest.size:
+            self.scaled = pygame.Surface(self.dest.size, 0, frame)
+        pygame.transform.scale(frame, self.dest.size, self.scaled)
+
+    def present_full(self, frame, offset):
+        for bar in self.bars:
+            self.screen.fill((0, 0, 0), bar)
+        self.scale_frame(frame)
+        self.screen.blit(self.scaled, (self.dest.x + offset[0], self.dest.y + offset[1]))
+        self.update_rects = None
+
+    # Finds the changed blocks and merges the ones next to each other on a row into one rect, in frame coordinates
+    def changed_rects(self, frame):
+        pixels = pygame.surfarray.pixels2d(frame)
+        np.not_equal(pixels, self.previous, out=self.changed)
+        np.copyto(self.previous, pixels)
+        del pixels
+
+        block = self.block
+        blocks = self.changed.reshape(self.frame_size[0] // block, block, self.frame_size[1] // block, block).any(axis=(1, 3))
+        rects = []
+        for y in np.flatnonzero(blocks.any(axis=0)):
+            edges = np.flatnonzero(np.diff(blocks[:, y], prepend=False, append=False))     # Starts and ends of the runs of changed blocks
+            for start, end in zip(edges[::2], edges[1::2]):
+                rects.append(pygame.Rect(start * block, y * block, (end - start) * block, block))
+        return rects
+
+    def present_changes(self, frame):
+        rects = self.changed_rects(frame)
+        self.update_rects = []
+        if not rects:
+            return
+
+        scale = self.integer_scale
+        if scale and frame.get_bitsize() == self.screen.get_bitsize() and frame.get_masks() == self.screen.get_masks():
+            # Fast path, every block is scaled straight on to the window
+            for rect in rects:
+                window_rect = pygame.Rect(self.dest.x + rect.x * scale, self.dest.y + rect.y * scale, rect.width * scale, rect.height * scale)
+                pygame.transform.scale(frame.subsurface(rect), window_rect.size, self.screen.subsurface(window_rect))
+                self.update_rects.append(window_rect)
+        else:
+            # Otherwise the whole frame is scaled and only the changed parts are copied, the edges of the blocks could land between window pixels
+            self.scale_frame(frame)
+            for rect in rects:
+                left = math.floor(rect.left * self.scale[0])
+                top = math.floor(rect.top * self.scale[1])
+                area = pygame.Rect(left, top, math.ceil(rect.right * self.scale[0]) - left, math.ceil(rect.bottom * self.scale[1]) - top).clip(self.scaled.get_rect())
+                self.screen.blit(self.scaled, (self.dest.x + area.x, self.dest.y + area.y), area)
+                self.update_rects.append(area.move(self.dest.x, self.dest.y))
+
+    # Sends what was presented to the window, "extra" are other areas drawn on the window since (the profiler overlay for example)
+    def flip(self, extra=()):
+        if self.update_rects is None:
+            pygame.display.update()
+        elif self.update_rects or extra:
+            pygame.display.update(self.update_rects + list(extra))
@@ -0,0 +1,131 @@
+import json
+import time
+from collections import deque
+
+import pygame
+
+# Frame time histogram buckets in milliseconds, the last bucket is everything slower
+HISTOGRAM_EDGES = [2, 4, 8, 12, 16.7, 25, 33.3]
+
+# Timing of every stage of the game loop, the game calls lap() after each stage and the time since the previous lap is counted for that stage
+# Laps only read the clock and add to a dictionary, so the profiler is always on
+# The last "history" frames are kept for the averages and the histogram shown in the overlay (F3 in the game)
+# A capture (F4 in the game) also saves every lap with its start time and writes them out in the Chrome trace format, open the file in chrome://tracing or https://ui.perfetto.dev
+class FrameProfiler:
+    def __init__(self, history=120):
+        self.stages = []        # Stage names in the order they first ran
+        self.frame = {}         # Nanoseconds spent in each stage during the current frame
+        self.history = deque(maxlen=history)    # (frame time, stage times) of the last frames
+        self.totals = {}        # Sums of the stage times in the history, kept up to date instead of summing the history again every frame
+        self.total_time = 0
+        self.frame_start = time.perf_counter_ns()
+        self.last = self.frame_start
+        self.events = None      # Laps saved for the trace while capturing
+        self.capture_start = 0
+        self.font = None
+
+    def begin_frame(self):
+        now = time.perf_counter_ns()
+        self.frame_start = now
+        self.last = now
+
+    def lap(self, stage):
+        now = time.perf_counter_ns()
+        if stage not in self.totals:
+            self.stages.append(stage)
+            self.totals[stage] = 0
+        self.frame[stage] = self.frame.get(stage, 0) + now - self.last
+        if self.events is not None:
+            self.events.append((stage, self.last, now - self.last))
+        self.last = now
+
+    def end_frame(self):
+        frame_time = self.last - self.frame_start
+        if len(self.history) == self.history.maxlen:
+            old_time, old_frame = self.history[0]
+            self.total_time -= old_time
+            for stage, duration in old_frame.items():
+                self.totals[stage] -= duration
+        self.history.append((frame_time, self.frame))
+        self.total_time += frame_time
+        for stage, duration in self.frame.items():
+            self.totals[stage] += duration
+        if self.events is not None:
+            self.events.append(('frame', self.frame_start, frame_time))
+        self.frame = {}
+
+    # Average milliseconds per frame of every stage over the history
+    def averages(self):
+        frames = max(1, len(self.history))
+        return [(stage, self.totals[stage] / frames / 1e6) for stage in self.stages]
+
+    # Count of the frames in the history falling into each HISTOGRAM_EDGES bucket
+    def histogram(self):
+        counts = [0] * (len(HISTOGRAM_EDGES) + 1)
+        for frame_time, frame in self.history:
+            ms = frame_time / 1e6
+            bucket = 0
+            while bucket < len(HISTOGRAM_EDGES) and ms >= HISTOGRAM_EDGES[bucket]:
+                bucket += 1
+            counts[bucket] += 1
+        return counts
+
+    # --- TRACE CAPTURE ---
+
+    @property
+    def capturing(self):
+        return self.events is not None
+
+    def start_capture(self):
+        self.events = []
+        self.capture_start = time.perf_counter_ns()
+
+    # Writes the captured laps as complete events ("ph": "X") of the Chrome trace format, times in microseconds
+    # Whole frames go on their own row above the stages
+    def stop_capture(self, path):
+        trace = []
+        for stage, start, duration in self.events:
+            trace.append({'name': stage, 'cat': 'frame' if stage == 'frame' else stage.split('.')[0], 'ph': 'X', 'pid': 0, 'tid': 0 if stage == 'frame' else 1,
+                          'ts': (start - self.capture_start) / 1000, 'dur': duration / 1000})
+        self.events = None
+        f = open(path, 'w')
+        json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+        f.close()
+        return len(trace)
+
+    # --- OVERLAY ---
+
+    def render(self, surf, pos=(4, 4)):
+        if self.font is None:
+            self.font = pygame.font.Font(None, 16)
+
+        # Rows of (label, value), the values are lined up on the right as the default font isn't monospaced
+        frames = max(1, len(self.history))
+        average = self.total_time / frames / 1e6
+        rows = [('frame ({:.0f} fps)'.format(1000 / average if average else 0), '{:.2f} ms'.format(average))]
+        for stage, ms in self.averages():
+            rows.append((stage, '{:.3f}'.format(ms)))
+        if self.capturing:
+            rows.append(('capturing trace...', ''))
+
+        x, y = pos
+        width = 170
+        line_height = self.font.get_linesize()
+        histogram_height = 40
+        # The area of the overlay is returned so only it needs to be updated on the window
+        area = surf.fill((0, 0, 0), (x, y, width, len(rows) * line_height + histogram_height + 8))
+        for label, value in rows:
+            surf.blit(self.font.render(label, False, (255, 255, 255)), (x + 4, y + 2))
+            value_img = self.font.render(value, False, (255, 255, 255))
+            surf.blit(value_img, (x + width - 4 - value_img.get_width(), y + 2))
+            y += line_height
+
+        # Histogram of the frame times, one bar per bucket, the buckets slower than 60 fps in red
+        counts = self.histogram()
+        bar_width = (width - 8) // len(counts)
+        y += histogram_height + 4
+        for i, count in enumerate(counts):
+            height = int(count / frames * histogram_height)
+            color = (255, 80, 80) if i > 0 and HISTOGRAM_EDGES[i - 1] >= 16.7 else (80, 255, 80)
+            surf.fill(color, (x + 4 + i * bar_width, y - height, bar_width - 1, height))
+        return area
@@ -0,0 +1,64 @@
+import pygame
+
+# Enemy bullet, only moves on the x-axis
+class Projectile:
+    __slots__ = ('pos', 'direction', 'timer', 'rect', 'alive')
+
+    def __init__(self):
+        self.pos = [0, 0]
+        self.direction = 0      # Speed on the x-axis, negative is left
+        self.timer = 0          # Steps since shot, the projectile is removed after 6 seconds
+        self.rect = pygame.Rect(0, 0, 1, 1)    # One pixel hitbox for the broad-phase collisions, moved along with the projectile
+        self.alive = False      # False once released, until then it is in the pool's active list
+
+    def move(self):
+        self.pos[0] += self.direction
+        self.timer += 1
+        self.rect.x = self.pos[0]
+        self.rect.y = self.pos[1]
+
+# Projectiles are fired and gone all the time, so instead of making new ones they are taken from a pool and put back when they hit something
+# The active projectiles are in the order they were fired, like in the old projectile list
+# Released projectiles are only marked dead and dropped from the list all at once by compact(), instead of searching the list for every projectile that hits something
+class ProjectilePool:
+    def __init__(self, capacity=64):
+        self.free = [Projectile() for i in range(capacity)]     # More are made if the pool runs out, and those stay in the pool afterwards
+        self.active = []
+        self.released = 0   # Dead projectiles still in the active list
+
+    def __iter__(self):
+        return iter(self.active)
+
+    def __len__(self):
+        return len(self.active)
+
+    def acquire(self, pos, direction):
+        projectile = self.free.pop() if self.free else Projectile()
+        projectile.pos[0], projectile.pos[1] = pos
+        projectile.direction = direction
+        projectile.timer = 0
+        projectile.alive = True
+        projectile.rect.x = pos[0]
+        projectile.rect.y = pos[1]
+        self.active.append(projectile)
+        return projectile
+
+    # The projectile stays in the active list until the next compact(), so it is not given out again before that
+    def release(self, projectile):
+        if projectile.alive:
+            projectile.alive = False
+            self.released += 1
+
+    # Drops the released projectiles from the active list in one pass, keeping the others in their order, and puts them back to the pool
+    def compact(self):
+        if self.released:
+            self.free.extend(projectile for projectile in self.active if not projectile.alive)
+            self.active[:] = [projectile for projectile in self.active if projectile.alive]
+            self.released = 0
+
+    def clear(self):
+        for projectile in self.active:
+            projectile.alive = False
+        self.free.extend(self.active)
+        self.active.clear()
+        self.released = 0
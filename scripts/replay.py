@@ -0,0 +1,77 @@
+import hashlib
+import struct
+import zlib
+
+# Recording the input of a game and playing it back, together with the game seed this repeats the run exactly
+# The input of every simulation step fits in one byte:
+#   bit 0 left held, bit 1 right held, bits 2-3 jumps pressed (0-3), bits 4-5 dashes pressed (0-3)
+# Steps with the same input are stored as runs of (input byte, u16 count) and the runs are zlib compressed,
+# an hour of play is usually a few kilobytes
+REPLAY_MAGIC = b'PGRP'
+REPLAY_VERSION = 1
+REPLAY_HEADER = struct.Struct('<4sHQH')     # Magic, version, game seed, starting level
+REPLAY_RUN = struct.Struct('<BH')
+MAX_SEED = (1 << 64) - 1    # The biggest seed that fits in the header
+
+def encode_input(movement, actions):
+    jumps = min(3, actions.count('jump'))
+    dashes = min(3, actions.count('dash'))
+    return bool(movement[0]) | bool(movement[1]) << 1 | jumps << 2 | dashes << 4
+
+# Jumps and dashes don't depend on each other, so the order they were pressed in within a step doesn't matter
+def decode_input(code):
+    return (bool(code & 1), bool(code & 2)), ('jump',) * (code >> 2 & 3) + ('dash',) * (code >> 4 & 3)
+
+# Given the input of every simulation step by the game, see Game.update
+class InputRecorder:
+    def __init__(self, path, seed, level=0):
+        # Checked at the start, the file is only written at the end of the game and the whole recording would be lost there
+        if not 0 <= seed <= MAX_SEED:
+            raise ValueError('A replay can only store seeds from 0 to ' + str(MAX_SEED) + ', not ' + str(seed))
+        if not 0 <= level <= 0xFFFF:
+            raise ValueError('A replay can only store levels from 0 to 65535, not ' + str(level))
+        self.path = path
+        self.seed = seed
+        self.level = level
+        self.runs = []  # [input byte, steps]
+
+    def record(self, movement, actions):
+        code = encode_input(movement, actions)
+        if self.runs and self.runs[-1][0] == code and self.runs[-1][1] < 0xFFFF:
+            self.runs[-1][1] += 1
+        else:
+            self.runs.append([code, 1])
+
+    def save(self):
+        data = b''.join(REPLAY_RUN.pack(code, steps) for code, steps in self.runs)
+        f = open(self.path, 'wb')
+        f.write(REPLAY_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, self.seed, self.level))
+        f.write(zlib.compress(data))
+        f.close()
+
+class Replay:
+    def __init__(self, path):
+        f = open(path, 'rb')
+        data = f.read()
+        f.close()
+        magic, version, self.seed, self.level = REPLAY_HEADER.unpack_from(data)
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            raise ValueError('Not a replay file or an unsupported version: ' + path)
+        self.runs = list(REPLAY_RUN.iter_unpack(zlib.decompress(data[REPLAY_HEADER.size:])))
+
+    def __len__(self):
+        return sum(steps for code, steps in self.runs)
+
+    # The recorded input as a script for Game.simulate
+    def script(self):
+        for code, steps in self.runs:
+            entry = decode_input(code)
+            for step in range(steps):
+                yield entry
+
+# Short fingerprint of the game state, two runs that print the same digest ended up in the same state
+def state_digest(game):
+    state = [game.level, game.dead, game.transition, game.player.pos, game.player.velocity, game.player.dashing]
+    state += [enemy.pos for enemy in game.enemies]
+    state += [projectile.pos for projectile in game.projectiles]
+    return hashlib.sha1(repr(state).encode()).hexdigest()[:12]
@@ -0,0 +1,20 @@
+import random
+
+# Every part of the game that needs random numbers has its own generator, all of them seeded from the one game seed
+# With the seed and the recorded input a run can be played again exactly the same (see replay.py)
+# Separate generators also keep the parts from affecting each other, for example rendering more frames doesn't change what the enemies do
+class GameRandom:
+    def __init__(self, seed):
+        self.seed = seed
+        self.ai = self.stream('ai')             # Enemy walking
+        self.effects = self.stream('effects')   # Sparks and particles
+        self.leaves = self.stream('leaves')     # Leaf spawning from the trees
+        self.clouds = self.stream('clouds')
+        self.screen = self.stream('screen')     # Screenshake, only used when rendering
+
+    def stream(self, name):
+        return random.Random(str(self.seed) + ':' + name)   # Strings are hashed into the seed the same way on every run and machine
+
+# Seed for a game started without one
+def new_seed():
+    return random.SystemRandom().randrange(1 << 32)
@@ -1,28 +1,71 @@
 import math
 
+import numpy as np
 import pygame
 
 # DaFluffyPotato's "signature" style of creating sparks
-class Spark:
-    def __init__(self, pos, angle, speed):
-        self.pos = list(pos)
-        self.angle = angle
-        self.speed = speed
+# All sparks are kept in a fixed size pool of NumPy arrays, so bursts of sparks don't allocate anything and their movement and diamond corners are worked out all at once
+# Drawing is not batched, every diamond is still its own polygon call, see render()
+class SparkSystem:
+    def __init__(self, capacity=512):
+        self.count = 0
+        self.pos = np.zeros((capacity, 2))
+        self.direction = np.zeros((capacity, 2))    # cos and sin of the angle, the angle never changes so they are calculated only once
+        self.speed = np.zeros(capacity)
+        self.dying = np.zeros(capacity, dtype=bool)
+        self.points = np.zeros((capacity, 4, 2))    # Reused buffer for the corners of the diamonds
+
+    def clear(self):
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    # When the pool is full the new spark is simply left out, there are already plenty on the screen
+    def spawn(self, pos, angle, speed):
+        if self.count == len(self.speed):
+            return
+        i = self.count
+        self.pos[i] = pos
+        self.direction[i] = (math.cos(angle), math.sin(angle))
+        self.speed[i] = speed
+        self.dying[i] = False
+        self.count += 1
 
     def update(self):
-        self.pos[0] += math.cos(self.angle) * self.speed    # X-axis
-        self.pos[1] += math.sin(self.angle) * self.speed    # Y-axis
-
-        self.speed = max(0, self.speed - 0.1)
-        return not self.speed
-    
-    def render(self, surf, offset=(0, 0)):
-        # Four corners of the spark diamond
-        render_points = [
-            (self.pos[0] + math.cos(self.angle) * self.speed * 3 - offset[0], self.pos[1] + math.sin(self.angle) * self.speed * 3 - offset[1]),
-            (self.pos[0] + math.cos(self.angle + math.pi * 0.5) * self.speed * 0.5 - offset[0], self.pos[1] + math.sin(self.angle + math.pi * 0.5) * self.speed * 0.5 - offset[1]),
-            (self.pos[0] + math.cos(self.angle + math.pi) * self.speed * 3 - offset[0], self.pos[1] + math.sin(self.angle + math.pi) * self.speed * 3 - offset[1]),
-            (self.pos[0] + math.cos(self.angle - math.pi * 0.5) * self.speed * 0.5 - offset[0], self.pos[1] + math.sin(self.angle - math.pi * 0.5) * self.speed * 0.5 - offset[1])
-        ]
-
-        pygame.draw.polygon(surf, (255, 255, 255), render_points)
\ No newline at end of file
+        # Sparks that stopped on the last update were rendered once more, now they are removed
+        n = self.count
+        dead = np.flatnonzero(self.dying[:n])
+        if len(dead):
+            new_count = n - len(dead)
+            holes = dead[dead < new_count]
+            movers = np.flatnonzero(~self.dying[new_count:n]) + new_count
+            for arr in (self.pos, self.direction, self.speed, self.dying):
+                arr[holes] = arr[movers]
+            self.count = n = new_count
+
+        speed = self.speed[:n]
+        self.pos[:n] += self.direction[:n] * speed[:, None]
+        np.maximum(speed - 0.1, 0, out=speed)
+        self.dying[:n] = speed == 0
+
+    def render(self, surf, offset=(0, 0), outline=None):
+        n = self.count
+        if not n:
+            return
+        # Four corners of every spark diamond: long points along the angle and short ones to the sides
+        pos = self.pos[:n] - offset
+        forward = self.direction[:n] * self.speed[:n, None]
+        side = forward[:, ::-1] * (-0.5, 0.5)    # Forward turned by 90 degrees and shortened to the width of the diamond
+        points = self.points[:n]
+        np.add(pos, forward * 3, out=points[:, 0])
+        np.add(pos, side, out=points[:, 1])
+        np.subtract(pos, forward * 3, out=points[:, 2])
+        np.subtract(pos, side, out=points[:, 3])
+
+        # One polygon call per spark, pygame has no call for filling many polygons at once
+        # Drawing them on a separate layer and blitting that once was tried, it is slower at any spark count as the layer has to be cleared and blitted every frame
+        for render_points in points.tolist():
+            pygame.draw.polygon(surf, (255, 255, 255), render_points)
+            if outline:
+                outline.add_polygon(render_points)
@@ -1,7 +1,16 @@
 import json
+import mmap
+import struct
+import sys
+import zlib
+from array import array
 
+import numpy as np
 import pygame
 
+from scripts.chunk_cache import ChunkCache
+from scripts.offgrid import OffgridIndex
+
 # Rules for autotiling, tile has neighbors which determine what the tile itself should look like, these are the neighbors which the neighbor search results are compared to
 AUTOTILE_MAP = {
     # Sorted is used to make sure the neighbors are checked in consistent order, also list can't be used as a key -> tupling
@@ -16,37 +25,164 @@ AUTOTILE_MAP = {
     tuple(sorted([(1, 0), (-1, 0), (0, 1), (0, -1)])): 8,
 }
 
+# Every same type neighbor sets one bit, so a neighbor pattern is a number 0-15 and the variant is looked up from a list instead of comparing sorted tuples
+AUTOTILE_BITS = [((1, 0), 1), ((-1, 0), 2), ((0, -1), 4), ((0, 1), 8)]
+AUTOTILE_TABLE = [None] * 16    # Neighbor mask -> variant, None for the patterns without a rule
+for neighbors, variant in AUTOTILE_MAP.items():
+    AUTOTILE_TABLE[sum(bit for shift, bit in AUTOTILE_BITS if shift in neighbors)] = variant
+
 NEIGHBOR_OFFSETS = [(-1, 0), (-1, -1), (0, -1), (1, -1), (1, 0), (0, 0), (-1, 1), (0, 1), (1, 1)]
 PHYSICS_TILES = {'grass', 'stone'}      # Faster to check random things from a set than from a list
 AUTOTILE_TYPES = {'grass', 'stone'}
 
+# Ongrid tiles are stored in square chunks of CHUNK_SIZE x CHUNK_SIZE cells, the size is a power of two so that bit shifting and masking can be used instead of division
+CHUNK_SHIFT = 4
+CHUNK_SIZE = 1 << CHUNK_SHIFT       # 16 tiles
+CHUNK_MASK = CHUNK_SIZE - 1
+CHUNK_CELLS = CHUNK_SIZE * CHUNK_SIZE
+
+# Every cell in a chunk is one unsigned 16-bit number: the high byte is the type id (0 meaning an empty cell) and the low byte is the variant
+VARIANT_BITS = 8
+VARIANT_MASK = (1 << VARIANT_BITS) - 1
+
+# Binary map format, picked by the file extension when saving and recognized by the magic bytes when loading
+# Header, then the payload (zlib compressed if the flag is set):
+#   type table: u16 count, then every type name as u16 length + UTF-8 bytes (u8 length in version 1), type ids count from 1 in this order
+#   chunks: u32 count, then for every chunk i32 cx, i32 cy and CHUNK_CELLS u16 cells packed like in memory
+#   offgrid tiles: u32 count, then for every tile u16 type id, u16 variant, f64 x, f64 y
+# Everything is little-endian. Uncompressed files are read through mmap and the chunks copied straight into arrays
+BINARY_MAP_EXT = '.map'
+MAP_MAGIC = b'PGMP'
+MAP_VERSION = 2
+MAP_HEADER = struct.Struct('<4sHHH')    # Magic, version, flags, tile size
+MAP_ZLIB = 1                            # Flag for a compressed payload
+MAP_CHUNK = struct.Struct('<ii')
+MAP_OFFGRID = struct.Struct('<HHdd')
+
 class Tilemap:
-    def __init__(self, game, tile_size=16):
+    def __init__(self, game, tile_size=16, cache_budget=16 * 1024 * 1024):
         self.game = game
         self.tile_size = tile_size
-        self.tilemap = {}           # Tiles on a grid, such as platforms
-        self.offgrid_tiles = []     # Tiles not on a grid, such as background
+        self.chunk_px = tile_size * CHUNK_SIZE  # Width and height of one chunk in pixels
+        self.chunks = {}            # Tiles on a grid, such as platforms. Chunk position (cx, cy) -> array of CHUNK_CELLS packed cells
+        self.tile_types = [None]    # Type id -> type name, id 0 is reserved for empty cells
+        self.type_ids = {}          # Type name -> type id
+        self.physics_ids = set()    # Type ids of the tiles in PHYSICS_TILES, checked with integers instead of strings
+        self.autotile_ids = set()   # Type ids of the tiles in AUTOTILE_TYPES
+        self.offgrid_tiles = OffgridIndex(self.offgrid_size)     # Tiles not on a grid, such as background
+        self.render_cache = ChunkCache(self, budget=cache_budget)
+
+        # Collision geometry, built once and shared by every entity. Rows of solid tiles next to each other are merged into one rect
+        self.physics_spans = {}     # Grid position -> rect of the solid span the tile belongs to
+        self.physics_queries = {}   # Grid position -> rects around it, so an entity staying in the same tile gets the same tuple back every frame
+        self.physics_dirty = True
+
+    # Gives the type its own id the first time it is seen
+    def type_id(self, tile_type):
+        if tile_type not in self.type_ids:
+            if len(self.tile_types) > 0xFFFF >> VARIANT_BITS:
+                raise ValueError('Too many tile types in one tilemap')
+            self.type_ids[tile_type] = len(self.tile_types)
+            self.tile_types.append(tile_type)
+            if tile_type in PHYSICS_TILES:
+                self.physics_ids.add(self.type_ids[tile_type])
+            if tile_type in AUTOTILE_TYPES:
+                self.autotile_ids.add(self.type_ids[tile_type])
+        return self.type_ids[tile_type]
+
+    # Packed cell value of the grid position (x, y), 0 if there is no tile
+    def cell(self, x, y):
+        chunk = self.chunks.get((x >> CHUNK_SHIFT, y >> CHUNK_SHIFT))
+        if chunk is None:
+            return 0
+        return chunk[((y & CHUNK_MASK) << CHUNK_SHIFT) | (x & CHUNK_MASK)]
+
+    def set_cell(self, x, y, value):
+        chunk_loc = (x >> CHUNK_SHIFT, y >> CHUNK_SHIFT)
+        chunk = self.chunks.get(chunk_loc)
+        if chunk is None:
+            if not value:   # No point in creating a chunk just to leave it empty
+                return
+            chunk = array('H', bytes(CHUNK_CELLS * 2))
+            self.chunks[chunk_loc] = chunk
+        index = ((y & CHUNK_MASK) << CHUNK_SHIFT) | (x & CHUNK_MASK)
+        if chunk[index] == value:   # Nothing changes, so the baked chunk stays valid (the editor keeps placing the same tile while the mouse is held)
+            return
+        if ((chunk[index] >> VARIANT_BITS) in self.physics_ids) != ((value >> VARIANT_BITS) in self.physics_ids):
+            # Solid tile added or removed, the collision geometry is built again on the next physics query
+            self.physics_dirty = True
+            self.physics_queries.clear()
+        chunk[index] = value
+        self.render_cache.invalidate(chunk_loc)     # The baked image of the chunk is now out of date
+        if not value and not any(chunk):    # Dropping the chunk once the last tile in it is gone
+            del self.chunks[chunk_loc]
+
+    # Goes through every tile on the grid as (x, y, cell value), chunk by chunk
+    def cells(self):
+        for (cx, cy), chunk in self.chunks.items():
+            for i, value in enumerate(chunk):
+                if value:
+                    yield (cx << CHUNK_SHIFT) + (i & CHUNK_MASK), (cy << CHUNK_SHIFT) + (i >> CHUNK_SHIFT), value
+
+    # Goes through the tiles of one chunk as (x, y, type, variant)
+    def chunk_tiles(self, chunk_loc):
+        chunk = self.chunks.get(chunk_loc)
+        if chunk is None:
+            return
+        for i, value in enumerate(chunk):
+            if value:
+                yield (chunk_loc[0] << CHUNK_SHIFT) + (i & CHUNK_MASK), (chunk_loc[1] << CHUNK_SHIFT) + (i >> CHUNK_SHIFT), self.tile_types[value >> VARIANT_BITS], value & VARIANT_MASK
+
+    # Turns a cell back into the tile dictionary the rest of the game and the map files use
+    def tile_data(self, x, y, value):
+        return {'type': self.tile_types[value >> VARIANT_BITS], 'variant': value & VARIANT_MASK, 'pos': [x, y]}
+
+    def get_tile(self, pos):
+        value = self.cell(pos[0], pos[1])
+        if value:
+            return self.tile_data(pos[0], pos[1], value)
+
+    # The variant and the type id have to fit in their bits of the cell, otherwise they would run into each other and a different tile would be stored
+    def set_tile(self, pos, tile_type, variant):
+        if not 0 <= variant <= VARIANT_MASK:
+            raise ValueError('Tile variant ' + str(variant) + ' does not fit in a cell, the variants go from 0 to ' + str(VARIANT_MASK))
+        type_id = self.type_id(tile_type)
+        if type_id >= 1 << (16 - VARIANT_BITS):
+            raise ValueError('Tile type id ' + str(type_id) + ' does not fit in a cell')
+        self.set_cell(pos[0], pos[1], (type_id << VARIANT_BITS) | variant)
+
+    # Returns True if there was a tile to remove
+    def remove_tile(self, pos):
+        if self.cell(pos[0], pos[1]):
+            self.set_cell(pos[0], pos[1], 0)
+            return True
+        return False
+
+    # Size of an offgrid tile for the spatial index, tiles without an image (spawners in the game) count as one grid tile
+    def offgrid_size(self, tile):
+        if tile['type'] in self.game.assets:
+            return self.game.assets[tile['type']][tile['variant']].get_size()
+        return (self.tile_size, self.tile_size)
 
     # Find given tile's positions in offgrid tiles and ongrid tiles, used for particles for example
     def extract(self, id_pairs, keep=False):
         matches = []
-        
-        for tile in self.offgrid_tiles.copy():
+
+        for serial, tile in list(self.offgrid_tiles.tiles.items()):
             if (tile['type'], tile['variant']) in id_pairs:
                 matches.append(tile.copy()) # Makes a copy of the tile so not to work with the original one
                 if not keep:
-                    self.offgrid_tiles.remove(tile)
+                    self.offgrid_tiles.remove(serial)
 
-        for loc in self.tilemap:
-            tile = self.tilemap[loc]
+        for x, y, value in list(self.cells()):     # Listing first as the chunks may be removed while going through them
+            tile = self.tile_data(x, y, value)     # A fresh tile dictionary, so it can be modified freely
             if (tile['type'], tile['variant']) in id_pairs:
-                matches.append(tile.copy())
-                matches[-1]['pos'] = matches[-1]['pos'].copy()  # Making a clean copy of the tile data for modification
-                matches[-1]['pos'][0] *= self.tile_size
-                matches[-1]['pos'][1] *= self.tile_size
+                tile['pos'][0] *= self.tile_size
+                tile['pos'][1] *= self.tile_size
+                matches.append(tile)
                 if not keep:
-                    del self.tilemap[loc]
-        
+                    self.set_cell(x, y, 0)
+
         return matches
 
     # Checking the neighboring tiles for physics calculations, no need to check all of the tiles
@@ -55,69 +191,246 @@ class Tilemap:
         tiles = []
         tile_loc = (int(pos[0] // self.tile_size), int(pos[1] // self.tile_size))      # Chopping off the decimals in consistent way
         for offset in NEIGHBOR_OFFSETS:
-            check_loc = str(tile_loc[0] + offset[0]) + ';' + str(tile_loc[1] + offset[1])
-            if check_loc in self.tilemap:
-                tiles.append(self.tilemap[check_loc])
+            value = self.cell(tile_loc[0] + offset[0], tile_loc[1] + offset[1])
+            if value:
+                tiles.append(self.tile_data(tile_loc[0] + offset[0], tile_loc[1] + offset[1], value))
         return tiles
-    
-    def save(self, path):
+
+    # Saves in the binary format if the path ends with BINARY_MAP_EXT, otherwise in the old "x;y" keyed JSON format
+    def save(self, path, compress=True):
+        if path.endswith(BINARY_MAP_EXT):
+            self.save_binary(path, compress=compress)
+            return
+
+        tilemap = {}
+        for x, y, value in self.cells():
+            tilemap[str(x) + ';' + str(y)] = self.tile_data(x, y, value)
+
         f = open(path, 'w')
-        json.dump({'tilemap': self.tilemap, 'tile_size': self.tile_size, 'offgrid': self.offgrid_tiles}, f)
+        json.dump({'tilemap': tilemap, 'tile_size': self.tile_size, 'offgrid': list(self.offgrid_tiles)}, f)
         f.close()   # This saves the file aswell
 
-    def load(self, path):
-        f = open(path, 'r')
+    def save_binary(self, path, compress=True):
+        f = open(path, 'wb')
+        f.write(self.to_binary(compress))
+        f.close()
+
+    # The whole map in the binary format as bytes, what save_binary() writes in the file
+    def to_binary(self, compress=True):
+        # Offgrid types go into the same type table, after the ongrid ones, in a copy so that saving doesn't change the tilemap's own table
+        offgrid = list(self.offgrid_tiles)
+        tile_types = list(self.tile_types)
+        type_ids = dict(self.type_ids)
+        for tile in offgrid:
+            if tile['type'] not in type_ids:
+                type_ids[tile['type']] = len(tile_types)
+                tile_types.append(tile['type'])
+
+        payload = bytearray(struct.pack('<H', len(tile_types) - 1))
+        for tile_type in tile_types[1:]:
+            name = tile_type.encode()
+            if len(name) > 0xFFFF:  # Checked before anything is written, so a bad name doesn't leave a broken file behind
+                raise ValueError('Tile type name too long for the map format: ' + tile_type[:32] + '...')
+            payload += struct.pack('<H', len(name)) + name
+
+        payload += struct.pack('<I', len(self.chunks))
+        for chunk_loc, chunk in self.chunks.items():
+            cells = array('H', chunk)
+            if sys.byteorder == 'big':
+                cells.byteswap()
+            payload += MAP_CHUNK.pack(*chunk_loc) + cells.tobytes()
+
+        payload += struct.pack('<I', len(offgrid))
+        for tile in offgrid:
+            payload += MAP_OFFGRID.pack(type_ids[tile['type']], tile['variant'], tile['pos'][0], tile['pos'][1])
+
+        flags = 0
+        if compress:
+            payload = zlib.compress(payload)
+            flags |= MAP_ZLIB
+
+        return MAP_HEADER.pack(MAP_MAGIC, MAP_VERSION, flags, self.tile_size) + payload
+
+    # Loads both formats, the binary one is recognized by its magic bytes
+    # "prebake" can be turned off when loading outside the main thread, baking blits the shared tile images that the main thread is drawing with
+    def load(self, path, prebake=True):
+        f = open(path, 'rb')
+        if f.read(len(MAP_MAGIC)) == MAP_MAGIC:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            f.close()
+            self.load_bytes(data, prebake=prebake)
+            data.close()
+            return
+        f.seek(0)
         map_data = json.load(f)
         f.close()
 
-        self.tilemap = map_data['tilemap']
+        self.clear()
         self.tile_size = map_data['tile_size']
-        self.offgrid_tiles = map_data['offgrid']
+        for tile in map_data['tilemap'].values():
+            self.set_tile(tile['pos'], tile['type'], tile['variant'])
+        for tile in map_data['offgrid']:
+            self.offgrid_tiles.add(tile)
+        self.loaded(prebake)
+
+    # A map in the binary format that is already in memory, for example one made by to_binary() in another process
+    def load_bytes(self, data, prebake=True):
+        self.clear()
+        self.load_binary(data)
+        self.loaded(prebake)
+
+    # Empty tilemap before loading a map in to it
+    def clear(self):
+        self.chunks = {}
+        self.tile_types = [None]
+        self.type_ids = {}
+        self.physics_ids = set()
+        self.autotile_ids = set()
+        self.render_cache.clear()
+        self.physics_dirty = True
+        self.physics_queries.clear()
+        self.offgrid_tiles.clear()
+
+    # Whatever is worked out from the tiles once they are all in
+    def loaded(self, prebake):
+        self.chunk_px = self.tile_size * CHUNK_SIZE
+        self.build_physics()
+        if prebake:
+            self.render_cache.prebake()
+
+    def load_binary(self, data):
+        magic, version, flags, self.tile_size = MAP_HEADER.unpack_from(data)
+        if version not in (1, MAP_VERSION):
+            raise ValueError('Unsupported map version ' + str(version))
+        with memoryview(data) as view:
+            payload = view[MAP_HEADER.size:]
+            if flags & MAP_ZLIB:
+                payload = memoryview(zlib.decompress(payload))
+            pos = 0
+
+            type_count = struct.unpack_from('<H', payload, pos)[0]
+            pos += 2
+            name_length = struct.Struct('<H' if version >= 2 else '<B')   # Version 1 had one byte for the length
+            for i in range(type_count):    # The table is empty, so the type ids come out the same as in the file
+                length = name_length.unpack_from(payload, pos)[0]
+                pos += name_length.size
+                self.type_id(bytes(payload[pos:pos + length]).decode())
+                pos += length
+
+            chunk_count = struct.unpack_from('<I', payload, pos)[0]
+            pos += 4
+            for i in range(chunk_count):
+                chunk_loc = MAP_CHUNK.unpack_from(payload, pos)
+                pos += MAP_CHUNK.size
+                chunk = array('H')
+                chunk.frombytes(payload[pos:pos + CHUNK_CELLS * 2])
+                if sys.byteorder == 'big':
+                    chunk.byteswap()
+                self.chunks[chunk_loc] = chunk
+                pos += CHUNK_CELLS * 2
+
+            offgrid_count = struct.unpack_from('<I', payload, pos)[0]
+            pos += 4
+            for i in range(offgrid_count):
+                type_id, variant, x, y = MAP_OFFGRID.unpack_from(payload, pos)
+                pos += MAP_OFFGRID.size
+                self.offgrid_tiles.add({'type': self.tile_types[type_id], 'variant': variant, 'pos': [x, y]})
+            payload.release()
 
     # For checking if a tile in this location is a solid one, used for example enemies to see if they are at the edge of a platform
     def solid_check(self, pos):
-        tile_loc = str(int(pos[0] // self.tile_size)) + ';' + str(int(pos[1] // self.tile_size))
-        if tile_loc in self.tilemap:                                # Does the location exist?
-            if self.tilemap[tile_loc]['type'] in PHYSICS_TILES:     # Is it physics tile?
-                return self.tilemap[tile_loc]                       # Returns atleast something if it is solid, can be used to see if there is something
-    
+        return (self.cell(int(pos[0] // self.tile_size), int(pos[1] // self.tile_size)) >> VARIANT_BITS) in self.physics_ids
+
+    # Merges the solid tiles of every row into spans and gives each tile its span's rect
+    # Done with NumPy for all the chunks at once, so that big maps stay quick to load
+    def build_physics(self):
+        self.physics_spans = {}
+        self.physics_queries = {}
+        self.physics_dirty = False
+        if not self.chunks or not self.physics_ids:
+            return
+
+        chunk_locs = np.array(list(self.chunks), dtype=np.int64)
+        cells = np.frombuffer(b''.join(self.chunks.values()), dtype=np.uint16).reshape(len(self.chunks), CHUNK_SIZE, CHUNK_SIZE)   # [chunk][row][column]
+        chunk_index, row, col = np.nonzero(np.isin(cells >> VARIANT_BITS, np.array(sorted(self.physics_ids), dtype=np.uint16)))
+        xs = (chunk_locs[chunk_index, 0] << CHUNK_SHIFT) + col
+        ys = (chunk_locs[chunk_index, 1] << CHUNK_SHIFT) + row
+        order = np.lexsort((xs, ys))    # Row by row, left to right
+        xs = xs[order]
+        ys = ys[order]
+
+        # A new span starts on a new row or after a gap in the row
+        starts = np.ones(len(xs), dtype=bool)
+        starts[1:] = (ys[1:] != ys[:-1]) | (xs[1:] != xs[:-1] + 1)
+        span_of_tile = np.cumsum(starts) - 1
+        first = np.flatnonzero(starts)
+        lengths = np.diff(np.append(first, len(xs)))
+        rects = [pygame.Rect(x * self.tile_size, y * self.tile_size, length * self.tile_size, self.tile_size) for x, y, length in zip(xs[first].tolist(), ys[first].tolist(), lengths.tolist())]
+        self.physics_spans = dict(zip(zip(xs.tolist(), ys.tolist()), [rects[i] for i in span_of_tile.tolist()]))
+
     # More physics in entities.py
-    # Checks to see if there is a tile with physics applied to it in the nearby tiles and creates a rectangular over it for physics calculations
+    # Gives the rectangulars of the solid tiles in the nearby tiles for physics calculations
+    # The rects are shared between all the callers and between frames, so they must not be modified
     def physics_rects_around(self, pos):
-        rects = []
-        for tile in self.tiles_around(pos):
-            if tile['type'] in PHYSICS_TILES:
-                rects.append(pygame.Rect(tile['pos'][0] * self.tile_size, tile['pos'][1] * self.tile_size, self.tile_size, self.tile_size))
+        tile_loc = (int(pos[0] // self.tile_size), int(pos[1] // self.tile_size))
+        rects = self.physics_queries.get(tile_loc)
+        if rects is None:
+            if self.physics_dirty:
+                self.build_physics()
+            found = []
+            for offset in NEIGHBOR_OFFSETS:
+                rect = self.physics_spans.get((tile_loc[0] + offset[0], tile_loc[1] + offset[1]))
+                if rect is not None and not any(rect is other for other in found):     # A span can cover several of the neighbors
+                    found.append(rect)
+            rects = tuple(found)
+            self.physics_queries[tile_loc] = rects
         return rects
-    
-    # Goes through all tiles on grid and checks their neighboring tiles to figure out how their variant should look
+
+    # Checks the neighboring tiles of one tile to figure out how its variant should look
+    def autotile_cell(self, x, y):
+        value = self.cell(x, y)
+        type_id = value >> VARIANT_BITS
+        if type_id not in self.autotile_ids:    # Only autotile the types in AUTOTILE_TYPES ie. grass and stone as of now, empty cells have id 0 which is never in there
+            return
+        mask = 0
+        for shift, bit in AUTOTILE_BITS:
+            if self.cell(x + shift[0], y + shift[1]) >> VARIANT_BITS == type_id:    # Only tiles of same type are neighbors
+                mask |= bit
+        variant = AUTOTILE_TABLE[mask]
+        if variant is not None:
+            self.set_cell(x, y, (type_id << VARIANT_BITS) | variant)
+
+    # A tile only affects the look of itself and its four neighbors, so after placing or removing one only those are autotiled again
+    def autotile_around(self, pos):
+        self.autotile_cell(pos[0], pos[1])
+        for shift, bit in AUTOTILE_BITS:
+            self.autotile_cell(pos[0] + shift[0], pos[1] + shift[1])
+
+    # Goes through all tiles on grid, for maps made before the editor autotiled while editing
     def autotile(self):
-        for loc in self.tilemap:
-            tile = self.tilemap[loc]
-            neighbors = set()
-            for shift in [(1, 0), (-1, 0), (0, -1), (0, 1)]:
-                check_loc = str(tile['pos'][0] + shift[0]) + ';' + str(tile['pos'][1] + shift[1])
-                if check_loc in self.tilemap:   # Neighbor exists
-                    if self.tilemap[check_loc]['type'] == tile['type']:     # Only tiles of same type are neighbors
-                        neighbors.add(shift)
-            neighbors = tuple(sorted(neighbors))
-            if (tile['type'] in AUTOTILE_TYPES) and (neighbors in AUTOTILE_MAP):    # Only autotile the types in AUTOTILE_TYPES ie. grass and stone as of now
-                tile['variant'] = AUTOTILE_MAP[neighbors]
-
-    # Off grid tiles rendered before on grid ones
-    def render(self, surf, offset=(0, 0)):
-        for tile in self.offgrid_tiles:
+        for x, y, value in list(self.cells()):
+            self.autotile_cell(x, y)
+
+    # Off grid tiles rendered before on grid ones, "outline" gets the images drawn for their outlines (see outline.py)
+    def render(self, surf, offset=(0, 0), outline=None):
+        # Only the offgrid tiles overlapping the screen are drawn, found through the spatial index
+        for serial in self.offgrid_tiles.query_rect(pygame.Rect(offset[0], offset[1], surf.get_width(), surf.get_height())):
+            tile = self.offgrid_tiles.tiles[serial]
             # No gridding for offgrid tiles
-            surf.blit(self.game.assets[tile['type']][tile['variant']], (tile['pos'][0] - offset[0], tile['pos'][1] - offset[1]))
-
-        # Tiles are in a dictionary and checking up something from one is fast no matter how much stuff is in the dictionary
-        # This means you can use it to render only the tiles that should ne on the screen akin to occlusion culling --> Optimization
-
-        # Loops through all the tile places on the screen grid starting from top left
-        # If a tile should be in the grid position, it is rendered
-        for x in range(offset[0] // self.tile_size, (offset[0] + surf.get_width()) // self.tile_size + 1):
-            for y in range(offset[1] // self.tile_size, (offset[1] + surf.get_height()) // self.tile_size + 1):
-                loc = str(x) + ';' + str(y)
-                if loc in self.tilemap:
-                    tile = self.tilemap[loc]
-                    surf.blit(self.game.assets[tile['type']][tile['variant']], (tile['pos'][0] * self.tile_size - offset[0], tile['pos'][1] * self.tile_size - offset[1]))
+            img = self.game.assets[tile['type']][tile['variant']]
+            pos = (tile['pos'][0] - offset[0], tile['pos'][1] - offset[1])
+            surf.blit(img, pos)
+            if outline:
+                outline.add(img, pos)
+
+        # Ongrid tiles are static, so they are drawn from the pre-rendered chunk surfaces, a handful of blits per frame instead of one per tile
+        # Tiles are looked up only for the chunks overlapping the screen, akin to occlusion culling --> Optimization
+        # The chunks one step up and left are included as big tiles can hang over from them
+        for cy in range(offset[1] // self.chunk_px - 1, (offset[1] + surf.get_height()) // self.chunk_px + 1):
+            for cx in range(offset[0] // self.chunk_px - 1, (offset[0] + surf.get_width()) // self.chunk_px + 1):
+                if (cx, cy) in self.chunks:
+                    img = self.render_cache.get((cx, cy))
+                    pos = (cx * self.chunk_px - offset[0], cy * self.chunk_px - offset[1])
+                    surf.blit(img, pos)
+                    if outline:     # The silhouette of a chunk is remembered as long as its baked surface
+                        outline.add(img, pos)
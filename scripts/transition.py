@@ -0,0 +1,58 @@
+import pygame
+
+TRANSITION_LENGTH = 30  # Steps the screen takes to close or open, the game's transition timer counts from -30 to 30
+
+# The effect between levels, the screen closes when a level is done and opens again on the next one
+# Every frame of the effect is drawn once when the style is picked and the game only blits the right one, before a new surface was made and drawn every frame
+# 'iris' is the original closing circle, F5 in the game switches between the styles
+class Transition:
+    STYLES = ['iris', 'fade', 'wipe', 'blinds']
+
+    def __init__(self, size, style='iris', length=TRANSITION_LENGTH):
+        self.size = size
+        self.length = length
+        self.set_style(style)
+
+    def toggle(self):
+        self.set_style(self.STYLES[(self.STYLES.index(self.style) + 1) % len(self.STYLES)])
+
+    def set_style(self, style):
+        self.style = style
+        # frames[i] is shown when the timer is i steps from the open screen, frames[0] is never used as the effect is off then
+        self.frames = [None] + [getattr(self, 'build_' + style)(i) for i in range(1, self.length + 1)]
+
+    # Black surface with the see through parts white, white is made transparent with the colorkey
+    # RLEACCEL packs the long runs of the same colour, so the frames take little memory and blit fast
+    def keyed_surface(self):
+        surf = pygame.Surface(self.size)
+        surf.set_colorkey((255, 255, 255), pygame.RLEACCEL)
+        return surf
+
+    def build_iris(self, i):
+        surf = self.keyed_surface()
+        pygame.draw.circle(surf, (255, 255, 255), (self.size[0] // 2, self.size[1] // 2), (self.length - i) * 8)
+        return surf
+
+    def build_fade(self, i):
+        surf = pygame.Surface(self.size)
+        surf.set_alpha(int(255 * i / self.length))
+        return surf
+
+    # Black coming in from the left
+    def build_wipe(self, i):
+        surf = self.keyed_surface()
+        surf.fill((255, 255, 255), (self.size[0] * i // self.length, 0, self.size[0], self.size[1]))
+        return surf
+
+    # Horizontal bars growing from the top of each 16 pixel band
+    def build_blinds(self, i):
+        surf = self.keyed_surface()
+        band = 16
+        for y in range(0, self.size[1], band):
+            surf.fill((255, 255, 255), (0, y + band * i // self.length, self.size[0], band - band * i // self.length))
+        return surf
+
+    # "timer" is the game's transition value, negative while opening and positive while closing
+    def render(self, surf, timer):
+        if timer:
+            surf.blit(self.frames[min(abs(timer), self.length)], (0, 0))
@@ -1,13 +1,100 @@
 import os
 import pygame
 
+from scripts.asset_cache import ASSET_CACHE
+
 BASE_IMG_PATH = 'data/images/'
+ATLAS_PAGE_SIZE = (1024, 1024)
+
+# Texture atlas, all loaded images are packed on to a few big pages together with their horizontally flipped versions
+# The images handed out are subsurfaces of the pages, so they work like any other surface, and rendering flipped images is just a lookup instead of pygame.transform.flip every frame
+class Atlas:
+    def __init__(self, page_size=ATLAS_PAGE_SIZE):
+        self.page_size = page_size
+        self.pages = []
+        self.shelf = [0, 0, 0]  # Packing position on the last page: x, y of the current row of images and the height of the row
+        self.regions = {}       # Image path -> (page index, rect of the image, rect of the flipped image)
+        self.images = {}        # Image path -> subsurface of the image
+        self.flipped = {}       # Subsurface -> subsurface of the flipped version
+
+    def new_page(self, size):
+        page = pygame.Surface(size).convert()
+        page.fill((0, 0, 0))
+        page.set_colorkey((0, 0, 0))    # Subsurfaces get the colorkey of their page
+        self.pages.append(page)
+        self.shelf = [0, 0, 0]
+
+    # Finds room for a w x h area, rows of images are filled from left to right and a new row is started under the tallest image of the row
+    def allocate(self, w, h):
+        if w > self.page_size[0] or h > self.page_size[1]:     # Too big to share a page
+            self.new_page((w, h))
+            self.shelf = [w, 0, h]
+            return len(self.pages) - 1, (0, 0)
+        if not self.pages or self.pages[-1].get_size() != self.page_size:
+            self.new_page(self.page_size)
+        if self.shelf[0] + w > self.page_size[0]:
+            self.shelf = [0, self.shelf[1] + self.shelf[2], 0]
+        if self.shelf[1] + h > self.page_size[1]:
+            self.new_page(self.page_size)
+        pos = (self.shelf[0], self.shelf[1])
+        self.shelf[0] += w
+        self.shelf[2] = max(self.shelf[2], h)
+        return len(self.pages) - 1, pos
+
+    def add(self, path, img):
+        w, h = img.get_size()
+        page_index, pos = self.allocate(w * 2, h)   # The flipped version goes right next to the image
+        page = self.pages[page_index]
+        rect = pygame.Rect(pos, (w, h))
+        flipped_rect = pygame.Rect(pos[0] + w, pos[1], w, h)
+        page.blit(img, rect)
+        page.blit(pygame.transform.flip(img, True, False), flipped_rect)
+
+        self.regions[path] = (page_index, rect, flipped_rect)
+        self.images[path] = page.subsurface(rect)
+        self.flipped[self.images[path]] = page.subsurface(flipped_rect)
+        return self.images[path]
+
+    # Page and area of the image for blitting straight from the atlas, surf.blit(page, pos, area)
+    def region(self, path, flip=False):
+        page_index, rect, flipped_rect = self.regions[path]
+        return self.pages[page_index], flipped_rect if flip else rect
+
+ATLAS = Atlas()
+
+# Horizontally flipped version of the image, precomputed for everything in the atlas
+def flip_image(img):
+    if img not in ATLAS.flipped:    # Images from outside the atlas are flipped once and remembered
+        ATLAS.flipped[img] = pygame.transform.flip(img, True, False)
+    return ATLAS.flipped[img]
 
 # Loading a single image
 def load_image(path):
-    img = pygame.image.load(BASE_IMG_PATH + path).convert()     # .convert() optimizes the image within pygame. Is magic, just do it.
-    img.set_colorkey((0, 0, 0))
-    return img
+    if path in ATLAS.images:    # Already loaded, images can be shared as nothing draws on them
+        return ATLAS.images[path]
+    img = ASSET_CACHE.image(BASE_IMG_PATH + path)    # Raw pixels from the asset cache if it has them, see asset_cache.py
+    if img is None:
+        img = pygame.image.load(BASE_IMG_PATH + path)
+    img = img.convert()     # .convert() optimizes the image within pygame. Is magic, just do it.
+    img.set_colorkey((0, 0, 0))     # Black is transparent, which is also why the atlas pages are filled with black
+    return ATLAS.add(path, img)
+
+# Stand-in for the sounds when there is no audio, it can be played like any other sound but does nothing
+class NullSound:
+    def play(self, *args, **kwargs):
+        pass
+
+    def set_volume(self, volume):
+        pass
+
+# Loading a sound effect, from the asset cache if it has it
+def load_sound(path):
+    if not pygame.mixer.get_init():     # Headless mode or no audio device
+        return NullSound()
+    sound = ASSET_CACHE.sound(path)
+    if sound is None:
+        sound = pygame.mixer.Sound(path)
+    return sound
 
 # Loading multiple images
 def load_images(path):
@@ -17,28 +104,56 @@ def load_images(path):
         images.append(load_image(path + '/' + img_name))
     return images
 
-# Animating images
+# Counts the simulation steps for all the animations, the game ticks it once per step
+# Animations only remember the tick they started on, so nothing has to be updated per animated object
+class AnimationClock:
+    def __init__(self):
+        self.now = 0
+
+    def tick(self):
+        self.now += 1
+
+ANIM_CLOCK = AnimationClock()
+
+# Animating images, one Animation is shared by everything that plays it and is never changed
 class Animation:
     def __init__(self, images, img_dur=5, loop=True):
         self.images = images
         self.img_duration = img_dur     # How long to show one image in the animation
         self.loop = loop
-        self.done = False
-        self.frame = 0
-
-    # Not 100% sure why this is needed, but it has something to do with the references to images
-    def copy(self):
-        return Animation(self.images, self.img_duration, self.loop)
-    
-    # Moving the frame by one if reached the current image's duration cap, the animation is looping or last image of the animation
-    def update(self):
+        self.length = img_dur * len(images)     # Steps in one run through the images
+
+        # Image of every step of the animation, looked up instead of dividing every frame, and the same for the flipped images
+        self.frame_indices = [i // img_dur for i in range(self.length)]
+        self.frames = [images[i] for i in self.frame_indices]
+        self.flipped_frames = [flip_image(img) for img in self.frames]
+
+    # Starts playing the animation from the current tick of the clock
+    def play(self):
+        return Playback(self, ANIM_CLOCK.now)
+
+    # Step of the animation the given number of steps after it started, looping animations wrap around and the rest stop at their last step
+    def frame(self, steps):
         if self.loop:
-            self.frame = (self.frame + 1) % (self.img_duration * len(self.images)) # Forces the images to loop around avoiding indexing errors
-        else:
-            self.frame = min(self.frame + 1, self.img_duration * len(self.images) - 1)
-            if self.frame >= self.img_duration * len(self.images) - 1:
-                self.done = True
-    
+            return steps % self.length
+        return min(steps, self.length - 1)
+
+# One playing of an animation, only the animation and the tick it started on
+class Playback:
+    __slots__ = ('animation', 'start')
+
+    def __init__(self, animation, start):
+        self.animation = animation
+        self.start = start
+
+    def frame(self):
+        return self.animation.frame(ANIM_CLOCK.now - self.start)
+
+    def done(self):
+        return not self.animation.loop and ANIM_CLOCK.now - self.start >= self.animation.length - 1
+
     # Returns the image to be rendered instead of rendering it for flexibility
-    def img(self):
-        return self.images[int(self.frame / self.img_duration)]
\ No newline at end of file
+    def img(self, flip=False):
+        if flip:
+            return self.animation.flipped_frames[self.frame()]
+        return self.animation.frames[self.frame()]
\ No newline at end of file